@@ -0,0 +1,15 @@
+# Standalone benchmarks for the garden engine. Run from the repo root, e.g.
+#   python -m benchmarks.bench_grid_api
+import os
+import platform
+import re
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Timings only compare on the host that recorded them, so baselines are
+# kept per host and interpreter, in a git-ignored directory.
+BASELINE_DIR = os.path.join(ROOT, "benchmarks", "baselines")
+
+def baseline_path(suite: str) -> str:
+    host = re.sub(r"[^A-Za-z0-9_.-]", "_", platform.node() or "unknown")
+    return os.path.join(BASELINE_DIR, f"{suite}-{host}-{platform.machine()}-py{platform.python_version()}.json")
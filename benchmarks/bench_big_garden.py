@@ -0,0 +1,63 @@
+"""Setup, run and validation cost of the big-garden steps at N=100, 500 and 1000.
+
+The cases are the catalog's steps on levels wider than the viewport
+threshold (the "Том цэцэрлэг" level): each builds the step's grid with
+``step.setup``, runs ``step.solution`` in-process (with the execution
+meter and the step's budget, as the app does) and checks it with
+``step.validator``. Heatmap rendering and grid diffing are timed too,
+since the app pays for them on every run.
+"""
+import argparse
+import time
+
+from garden.codecache import compile_user_code
+from garden.content import get_catalog
+from garden.meter import DEFAULT_STEP_BUDGET, ExecutionMeter
+from garden.render import VIEWPORT_THRESHOLD, heatmap
+from garden.sandbox import exec_user_code, grid_diff, snapshot_namespace
+
+
+def big_steps(catalog):
+    """(name, step) for every step with a solution on a level wider than the viewport."""
+    return [(f"L{lvl.id}-S{i}", step) for lvl in catalog.levels if lvl.size > VIEWPORT_THRESHOLD
+            for i, step in enumerate(lvl.steps) if step.solution]
+
+
+def _best_ms(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 1000])
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--content-dir", default=None, help="level files (default: content/levels)")
+    args = ap.parse_args(argv)
+
+    cases = big_steps(get_catalog(args.content_dir))
+    print(f"{'N':>5} {'case':<12} {'setup ms':>9} {'run ms':>8} {'valid ms':>9} {'diff ms':>8} {'heatmap ms':>11}")
+    for N in args.sizes:
+        for name, step in cases:
+            code = compile_user_code(step.solution).code
+            budget = step.budget or DEFAULT_STEP_BUDGET
+            base = step.setup(N)
+            done = base.copy()
+            ns = snapshot_namespace(exec_user_code(code, done, ExecutionMeter(budget)), step.reads)
+            ok, message = step.validator(done, N, ns)
+            assert ok, f"{name} failed at N={N}: {message}"
+
+            t_setup = _best_ms(lambda: step.setup(N), args.repeat)
+            t_run = _best_ms(lambda: exec_user_code(code, base.copy(), ExecutionMeter(budget)), args.repeat)
+            t_valid = _best_ms(lambda: step.validator(done, N, ns), args.repeat)
+            t_diff = _best_ms(lambda: grid_diff(bytes(base.data), done.data), args.repeat)
+            t_heat = _best_ms(lambda: heatmap(done), args.repeat)
+            print(f"{N:>5} {name:<12} {t_setup:>9.2f} {t_run:>8.2f} {t_valid:>9.2f} {t_diff:>8.2f} {t_heat:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
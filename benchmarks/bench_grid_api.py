@@ -0,0 +1,54 @@
+"""Calls per second of the sandbox ``water`` API, before and after in-place mutation.
+
+"before" replays the original implementation: a ``List[Tile]`` held on a
+session-state-like object, looked up twice per call, with a new ``Tile``
+allocated for every write. "after" is ``garden.sandbox.grid_api_factory``.
+"""
+import argparse
+import time
+
+from garden.grid import Tile, make_grid
+from garden.sandbox import grid_api_factory
+
+
+class _SessionState:
+    # Attribute access routed through __getattr__, like st.session_state.
+    def __init__(self, **kw):
+        object.__setattr__(self, "_d", dict(kw))
+    def __getattr__(self, k):
+        return self._d[k]
+    def __setattr__(self, k, v):
+        self._d[k] = v
+
+
+def legacy_api(session):
+    def water(i:int):
+        if 0 <= i < len(session.grid):
+            t = session.grid[i]
+            session.grid[i] = Tile(plant=t.plant, watered=True, fertilized=t.fertilized, removed=t.removed)
+    return water
+
+
+def _rate(water, calls: int) -> float:
+    t0 = time.perf_counter()
+    for i in range(calls):
+        water(i)
+    return calls / (time.perf_counter() - t0)
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", type=int, nargs="+", default=[5, 50, 300])
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args(argv)
+
+    print(f"{'N':>6} {'calls':>9} {'before/s':>13} {'after/s':>13} {'speedup':>8}")
+    for N in args.sizes:
+        calls = N * N
+        before = max(_rate(legacy_api(_SessionState(grid=make_grid(N).to_list())), calls) for _ in range(args.repeat))
+        after = max(_rate(grid_api_factory(make_grid(N))[0], calls) for _ in range(args.repeat))
+        print(f"{N:>6} {calls:>9} {before:>13,.0f} {after:>13,.0f} {after / before:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""Headless load test: simulated learners on one process, without Streamlit or a network.
+
+    python -m benchmarks.loadtest --sessions 50 --think 0.5
+    python -m benchmarks.loadtest --sessions 200 --duration 60 --workers 8
+
+Each session is a thread driving its own :class:`~garden.state.GardenState`
+through the engine calls the page makes, the way Streamlit runs sessions
+on threads of one server process. A session walks every step of every
+level: it types into the starter, runs it, edits again, runs the reference
+solution, sometimes resets or goes back a step, and moves on. Every action
+is timed like a rerun: the action itself plus the grid drawing and
+progress record the page would produce after it.
+
+Reported: actions per second, latency percentiles per action and overall,
+peak RSS of this process plus its sandbox workers, and the per-stage
+timings from :mod:`garden.metrics`.
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from garden import metrics, runner, workers
+from garden.content import get_catalog
+from garden.levels import Catalog
+from garden.render import (VIEWPORT_SIZE, VIEWPORT_THRESHOLD, cell_updates, heatmap, render_grid_html,
+                           render_window_html)
+from garden.results import ResultCache
+from garden.state import GardenState
+from garden.store import encode_record
+
+
+@dataclass
+class Recorder:
+    latencies: Dict[str, List[float]] = field(default_factory=dict)
+    errors: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def add(self, action: str, seconds: float) -> None:
+        with self._lock:
+            self.latencies.setdefault(action, []).append(seconds)
+
+
+class Learner:
+    def __init__(self, n: int, catalog: Catalog, rec: Recorder, pool: Optional[workers.SandboxPool],
+                 cache: Optional[ResultCache], think: float, unique: bool, seed: int):
+        self.n = n
+        self.catalog = catalog
+        self.rec = rec
+        self.pool = pool
+        self.cache = cache
+        self.think = think
+        self.unique = unique
+        self.rng = random.Random(seed * 100_003 + n)
+        self.state = GardenState()
+        self.attempt = 0
+        self._shown: Optional[bytes] = None   # grid bytes last "sent to the browser"
+        self._saved = None
+
+    # -- what a rerun of the page costs after each action --
+    def _render(self) -> None:
+        state, level = self.state, self.state.level(self.catalog)
+        grid = state.grid
+        if level.show_grid:
+            if level.size > VIEWPORT_THRESHOLD:
+                heatmap(grid)
+                render_window_html(grid, 0, 0, VIEWPORT_SIZE, VIEWPORT_SIZE)
+            elif self._shown is None or len(self._shown) != len(grid.data):
+                render_grid_html(grid)
+            else:
+                cell_updates(self._shown, grid.data)
+            self._shown = bytes(grid.data)
+        sig = state.signature()
+        if sig != self._saved:
+            encode_record(state.to_record())
+            self._saved = sig
+
+    def _act(self, action: str, fn) -> None:
+        if self.think:
+            time.sleep(self.rng.expovariate(1 / self.think))
+        t0 = time.perf_counter()
+        try:
+            fn()
+            self.state.sync(self.catalog)
+            self._render()
+        except Exception:
+            self.rec.errors += 1
+            raise
+        finally:
+            self.rec.add(action, time.perf_counter() - t0)
+
+    def _source(self, code: str) -> str:
+        # A trailing comment makes every submission distinct, as real ones are.
+        self.attempt += 1
+        return f"{code}\n# learner {self.n} attempt {self.attempt}" if self.unique else code
+
+    def _run(self, code: str) -> None:
+        runner.run(self.state, self.catalog, self._source(code), pool=self.pool, cache=self.cache)
+
+    def walk(self, deadline: float) -> bool:
+        # One pass over every step; False once the deadline has passed.
+        state, catalog = self.state, self.catalog
+        self._act("open", lambda: state.goto(catalog, 0, 0))
+        for li, level in enumerate(catalog.levels):
+            for si, step in enumerate(level.steps):
+                if time.monotonic() > deadline:
+                    return False
+                if (state.level_idx, state.step_idx) != (li, si):
+                    self._act("next", lambda: state.goto(catalog, li, si))
+                key, solution = state.editor_key, step.solution or step.starter
+                self._act("edit", lambda: state.drafts.put(key, step.starter + "\n", step.starter))
+                self._act("run", lambda: self._run(step.starter))
+                if self.rng.random() < 0.2:
+                    self._act("reset", lambda: state.reset(catalog))
+                self._act("edit", lambda: state.drafts.put(key, solution, step.starter))
+                self._act("run", lambda: self._run(solution))
+                if si and self.rng.random() < 0.1:
+                    self._act("prev", lambda: state.goto(catalog, li, si - 1))
+        return True
+
+
+def _rss_bytes(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+def _children(pid: int) -> List[int]:
+    out = []
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    # ppid is the 2nd field after the ")" that ends the command name.
+                    if int(f.read().rsplit(")", 1)[1].split()[1]) == pid:
+                        out.append(int(entry))
+            except (OSError, ValueError, IndexError):
+                pass
+    return out
+
+
+class RssSampler(threading.Thread):
+    # Peak resident memory of this process and of this process plus its children.
+    def __init__(self, interval: float = 0.2):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_self = 0
+        self.peak_total = 0
+        self._stop_event = threading.Event()
+
+    def sample(self) -> None:
+        me = os.getpid()
+        own = _rss_bytes(me)
+        self.peak_self = max(self.peak_self, own)
+        self.peak_total = max(self.peak_total, own + sum(_rss_bytes(c) for c in _children(me)))
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            self.sample()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+        self.sample()
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m benchmarks.loadtest", description=__doc__.splitlines()[0])
+    ap.add_argument("--sessions", type=int, default=20, help="concurrent simulated learners")
+    ap.add_argument("--laps", type=int, default=1, help="walks through every step per learner")
+    ap.add_argument("--duration", type=float, default=None, help="stop after this many seconds")
+    ap.add_argument("--think", type=float, default=0.0, help="mean pause before each action, in seconds")
+    ap.add_argument("--workers", type=int, default=None, help="sandbox workers (default: as the app)")
+    ap.add_argument("--no-sandbox", action="store_true", help="run learner code in-process")
+    ap.add_argument("--shared-code", action="store_true",
+                    help="identical submissions across learners, so the result cache serves most runs")
+    ap.add_argument("--content-dir", default=None)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    catalog = get_catalog(args.content_dir)
+    pool = None
+    if not args.no_sandbox and workers.available():
+        pool = workers.SandboxPool(args.workers)
+    cache = ResultCache()   # private, so earlier runs in this process don't skew it
+    metrics.reset()
+    metrics.enable()
+    rec = Recorder()
+    sampler = RssSampler()
+    sampler.sample()
+    sampler.start()
+
+    deadline = time.monotonic() + args.duration if args.duration else float("inf")
+    learners = [Learner(n, catalog, rec, pool, cache, args.think, not args.shared_code, args.seed)
+                for n in range(args.sessions)]
+
+    def drive(learner: Learner) -> None:
+        for _ in range(args.laps):
+            if not learner.walk(deadline):
+                return
+
+    threads = [threading.Thread(target=drive, args=(ln,), name=f"learner-{ln.n}") for ln in learners]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    sampler.stop()
+    if pool is not None:
+        pool.close()
+
+    everything = sorted(x for xs in rec.latencies.values() for x in xs)
+    print(f"{args.sessions} sessions, {'sandbox x' + str(pool.size) if pool else 'in-process'}, "
+          f"think {args.think}s: {len(everything)} actions in {elapsed:.1f}s = {len(everything) / elapsed:.1f}/s, "
+          f"{rec.errors} errors")
+    print(f"{'action':<8} {'count':>7} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for action, xs in sorted(rec.latencies.items()) + [("all", everything)]:
+        xs = sorted(xs)
+        print(f"{action:<8} {len(xs):>7} {1000 * percentile(xs, 0.5):>8.1f} {1000 * percentile(xs, 0.9):>8.1f} "
+              f"{1000 * percentile(xs, 0.99):>8.1f} {1000 * (xs[-1] if xs else 0):>8.1f}")
+    print(f"peak RSS: {sampler.peak_self / 2**20:.0f} MiB this process, "
+          f"{sampler.peak_total / 2**20:.0f} MiB with sandbox workers")
+    print("stages (garden.metrics):")
+    for stage, h in metrics.histograms().items():
+        s = h.summary()
+        print(f"  {stage:<9} {s['count']:>7} p50 {s['p50_ms']:>7.2f} ms  p99 {s['p99_ms']:>7.2f} ms")
+    return 1 if rec.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""Benchmark suite for the garden engine, with JSON results and a baseline check.
+
+    python -m benchmarks.run                      # run everything, compare to this host's baseline
+    python -m benchmarks.run -k run/ -o out.json  # only matching cases, save results
+    python -m benchmarks.run --update-baseline    # accept the current numbers
+
+Cases, each timed with ``timeit`` (loops of about 20 ms, best of ``--repeat``):
+
+    grid/make/N=...         make_grid
+    setup/<step>/N=...      every Step.setup
+    api/water/N=...         100k calls through grid_api_factory
+    run/<step>              run_user_code end to end on Step.solution,
+                            in-process (``--sandbox``: run-sandbox/, through
+                            a worker)
+    validate/<step>         the step's validator on the solved grid
+    draw/full|update/N=...  what Main's draw_grid_html costs: render_grid_html
+                            with HTML_CACHE cleared, or a fingerprint plus
+                            changed-cell updates
+    draw/symbols/N=...      symbol_for_tile over every tile
+    draw/heatmap|window/N=  the viewport Main shows instead for gardens over
+                            VIEWPORT_THRESHOLD (render_window_html, uncached)
+
+A case regresses when it is slower than the baseline by more than
+``--tolerance`` and by more than ``--min-ms``; any regression exits 1.
+Baselines are per host (see :func:`benchmarks.baseline_path`); on a host
+without one nothing is compared.
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import sys
+import time
+import timeit
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from benchmarks import ROOT, baseline_path
+from garden.content import get_catalog
+from garden.grid import WATERED_BIT, make_grid
+from garden.levels import Catalog
+from garden.render import (HTML_CACHE, VIEWPORT_SIZE, VIEWPORT_THRESHOLD, cell_updates, grid_fingerprint, heatmap,
+                           render_grid_html, render_window_html, symbol_for_tile)
+from garden.runner import run_user_code
+from garden.sandbox import grid_api_factory
+
+BASELINE = baseline_path("run")
+
+SIZES = (5, 100, 1000)
+API_CALLS = 100_000
+TARGET_SECONDS = 0.02   # per timed repeat
+
+def step_name(level_id: str, step_idx: int) -> str:
+    return f"L{level_id}-S{step_idx}"
+
+
+def measure(fn: Callable[[], object], repeat: int) -> Dict[str, float]:
+    timer = timeit.Timer(fn)
+    number = 1
+    while timer.timeit(number) < TARGET_SECONDS:
+        number *= 2
+    times = sorted(t / number for t in timer.repeat(repeat, number))
+    return {"best_ms": times[0] * 1000, "median_ms": times[len(times) // 2] * 1000, "loops": number}
+
+
+def cases(catalog: Catalog, sizes: Tuple[int, ...], pool=None) -> Iterator[Tuple[str, Callable[[], object]]]:
+    for N in sizes:
+        yield f"grid/make/N={N}", lambda N=N: make_grid(N)
+    for lvl in catalog.levels:
+        for i, step in enumerate(lvl.steps):
+            for N in sorted({*sizes, lvl.size}):
+                yield f"setup/{step_name(lvl.id, i)}/N={N}", lambda s=step, N=N: s.setup(N)
+
+    for N in sizes:
+        water = grid_api_factory(make_grid(N))[0]
+        n = N * N
+
+        def calls(water=water, n=n):
+            for i in range(API_CALLS):
+                water(i % n)
+        yield f"api/water/N={N}", calls
+
+    for lvl in catalog.levels:
+        for i, step in enumerate(lvl.steps):
+            source = step.solution
+            if not source:
+                continue
+            res, solved = run_user_code(source, lvl, step, pool=pool, cache=None)
+            if not res.ok:
+                raise RuntimeError(f"reference solution for {step_name(lvl.id, i)} fails: {res.error or res.message}")
+            name = step_name(lvl.id, i)
+            yield f"{'run-sandbox' if pool is not None else 'run'}/{name}", lambda l=lvl, s=step, src=source: run_user_code(src, l, s, pool=pool, cache=None)
+            yield f"validate/{name}", lambda l=lvl, s=step, g=solved, ns=res.namespace: s.validator(g, l.size, ns)
+
+    for N in sizes:
+        before = make_grid(N)
+        after = before.copy()
+        after.set_flags(WATERED_BIT, 0, N * N, 3)
+        if N <= VIEWPORT_THRESHOLD:
+            yield f"draw/full/N={N}", lambda g=after: (HTML_CACHE.clear(), render_grid_html(g))
+            yield f"draw/update/N={N}", lambda b=bytes(before.data), g=after: (grid_fingerprint(g), cell_updates(b, g.data))
+            yield f"draw/symbols/N={N}", lambda g=after: [symbol_for_tile(t) for t in g]
+        else:
+            yield f"draw/heatmap/N={N}", lambda g=after: heatmap(g)
+            yield f"draw/window/N={N}", lambda g=after: (HTML_CACHE.clear(),
+                                                         render_window_html(g, 0, 0, VIEWPORT_SIZE, VIEWPORT_SIZE))
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            tolerance: float, min_ms: float) -> List[str]:
+    regressions = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        now, then = r["best_ms"], base["best_ms"]
+        if now > then * (1 + tolerance) and now - then > min_ms:
+            regressions.append(f"{name}: {now:.3f} ms vs {then:.3f} ms baseline ({now / then - 1:+.0%})")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.splitlines()[0])
+    ap.add_argument("-k", "--filter", default=None, help="only cases whose name matches this regex")
+    ap.add_argument("-o", "--output", default=None, help="write results as JSON")
+    ap.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="grid sides for the N= cases")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--sandbox", action="store_true", help="run submissions through a sandbox worker")
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    ap.add_argument("--min-ms", type=float, default=0.05, help="ignore slowdowns smaller than this")
+    ap.add_argument("--update-baseline", action="store_true")
+    args = ap.parse_args(argv)
+
+    pool = None
+    if args.sandbox:
+        from garden.workers import SandboxPool
+        pool = SandboxPool(1)
+    pattern = re.compile(args.filter) if args.filter else None
+    results: Dict[str, Dict[str, float]] = {}
+    try:
+        for name, fn in cases(get_catalog(), tuple(args.sizes), pool):
+            if pattern is not None and not pattern.search(name):
+                continue
+            results[name] = r = measure(fn, args.repeat)
+            print(f"{name:<28} {r['best_ms']:>10.3f} ms  (median {r['median_ms']:.3f}, {r['loops']} loops)")
+    finally:
+        if pool is not None:
+            pool.close()
+
+    report = {
+        "meta": {"host": platform.node(), "python": platform.python_version(), "machine": platform.machine(),
+                 "sandbox": args.sandbox, "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    baseline: Dict[str, Dict[str, float]] = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    if args.update_baseline:
+        baseline.update(results)
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({**report, "results": baseline}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline written to {os.path.relpath(args.baseline, ROOT)}")
+        return 0
+
+    if not baseline:
+        print(f"no baseline at {os.path.relpath(args.baseline, ROOT)}; record one with --update-baseline",
+              file=sys.stderr)
+    regressions = compare(results, baseline, args.tolerance, args.min_ms)
+    for msg in regressions:
+        print(f"REGRESSION: {msg}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
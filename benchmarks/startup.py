@@ -0,0 +1,145 @@
+"""Cold-start import cost of the app, the engine and the sandbox worker.
+
+Each target is imported in a fresh ``python -X importtime`` interpreter;
+the best of ``--repeat`` runs is kept, with the heaviest modules listed.
+Modules the bare interpreter already imports (``site`` and friends) are
+not charged to a target.
+Targets:
+
+    worker  what ``python -m garden.workers`` imports before its first job
+    engine  the Streamlit-free grading path (garden.runner, garden.content)
+    app     the top-level imports of Main.py, read with ``ast``
+
+Heavy modules that a target must not pull in at import time (NumPy in the
+worker and engine, Matplotlib anywhere) fail the run, and so does a target
+slower than this host's baseline (:func:`benchmarks.baseline_path`) by
+more than ``--tolerance``. Record or refresh it with ``--update-baseline``.
+"""
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from benchmarks import ROOT, baseline_path
+
+BASELINE = baseline_path("startup")
+
+FORBIDDEN = {
+    "worker": ("numpy", "streamlit", "matplotlib"),
+    "engine": ("numpy", "streamlit", "matplotlib"),
+    "app": ("matplotlib",),
+}
+
+
+def _app_imports() -> str:
+    # Main.py's module-level import statements, without running the page.
+    with open(os.path.join(ROOT, "Main.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    return "\n".join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def targets() -> Dict[str, str]:
+    return {
+        "worker": "import garden.workers",
+        "engine": "import garden.runner, garden.content",
+        "app": _app_imports(),
+    }
+
+
+def _importtime(code: str) -> List[Tuple[str, float]]:
+    # (module, self ms) for every import ``code`` triggers in a fresh interpreter.
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in (ROOT, os.environ.get("PYTHONPATH")) if p))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          cwd=ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed")
+    rows = []
+    for line in proc.stderr.splitlines():
+        # "import time:   self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, _cum_us, name = line.split(":", 1)[1].split("|")
+        rows.append((name.strip(), float(self_us) / 1000))
+    return rows
+
+
+def import_profile(code: str, startup: frozenset = frozenset()) -> Tuple[float, Dict[str, float]]:
+    """Import time (ms) of ``code`` and ms per top-level package, minus the ``startup`` modules."""
+    per_pkg: Dict[str, float] = {}
+    total = 0.0
+    for name, ms in _importtime(code):
+        if name in startup:
+            continue
+        total += ms
+        pkg = name.split(".")[0]
+        per_pkg[pkg] = per_pkg.get(pkg, 0.0) + ms
+    return total, per_pkg
+
+
+def startup_modules() -> frozenset:
+    # What the bare interpreter (site, .pth hooks) imports; not charged to any target.
+    return frozenset(name for name, _ in _importtime("pass"))
+
+
+def measure(code: str, repeat: int, startup: frozenset = frozenset()) -> Tuple[float, Dict[str, float]]:
+    return min((import_profile(code, startup) for _ in range(repeat)), key=lambda r: r[0])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m benchmarks.startup", description=__doc__.splitlines()[0])
+    ap.add_argument("targets", nargs="*", help="subset of worker, engine, app (default: all)")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--top", type=int, default=5, help="heaviest packages to list per target")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown over the baseline")
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--update-baseline", action="store_true")
+    args = ap.parse_args(argv)
+
+    all_targets = targets()
+    names = args.targets or list(all_targets)
+    unknown = [n for n in names if n not in all_targets]
+    if unknown:
+        ap.error(f"unknown target(s): {', '.join(unknown)}")
+
+    baseline: Dict[str, float] = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    startup = startup_modules()
+    failures: List[str] = []
+    results: Dict[str, float] = {}
+    print(f"{'target':<8} {'ms':>8} {'baseline':>9}  heaviest")
+    for name in names:
+        total, per_pkg = measure(all_targets[name], args.repeat, startup)
+        results[name] = round(total, 1)
+        heavy = sorted(per_pkg.items(), key=lambda kv: -kv[1])[:args.top]
+        base = baseline.get(name)
+        print(f"{name:<8} {total:>8.1f} {base if base is not None else '-':>9}  "
+              + ", ".join(f"{pkg} {ms:.0f}" for pkg, ms in heavy))
+        for mod in FORBIDDEN[name]:
+            if mod in per_pkg:
+                failures.append(f"{name} imports {mod}")
+        if base is not None and not args.update_baseline and total > base * (1 + args.tolerance):
+            failures.append(f"{name} took {total:.1f} ms, over {base} ms + {args.tolerance:.0%}")
+
+    if args.update_baseline:
+        baseline.update(results)
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline written to {os.path.relpath(args.baseline, ROOT)}")
+    elif not baseline:
+        print(f"no baseline at {os.path.relpath(args.baseline, ROOT)}; record one with --update-baseline",
+              file=sys.stderr)
+    for msg in failures:
+        print(f"FAIL: {msg}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,3 @@
+# Python Garden engine. Nothing in this package imports Streamlit: Main.py is
+# a UI over garden.state.GardenState and garden.runner, and the batch grader,
+# benchmarks and load tests drive the same engine without a server.
@@ -0,0 +1,82 @@
+import ast
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+_LOOPS = (ast.For, ast.AsyncFor, ast.While, ast.comprehension)
+_NAME_GETTERS = {"getattr", "hasattr", "setattr", "delattr"}
+
+# Frame, generator, coroutine and traceback attributes: each leads back to
+# a host frame, and from its globals to the real builtins.
+BLOCKED_ATTRIBUTES = frozenset({
+    "gi_frame", "gi_code", "gi_yieldfrom", "cr_frame", "cr_code", "cr_await", "cr_origin",
+    "ag_frame", "ag_code", "ag_await", "f_back", "f_globals", "f_locals", "f_builtins", "f_code",
+    "tb_frame", "tb_next",
+})
+
+
+@dataclass
+class CodeMetrics:
+    loops: int = 0
+    max_loop_depth: int = 0   # deepest loop-inside-loop nesting
+
+    def estimated_passes(self, side: int) -> int:
+        # Runs of the innermost loop body if each loop walks one side of the garden.
+        return side ** self.max_loop_depth
+
+
+@dataclass
+class Analysis:
+    tree: ast.Module
+    metrics: CodeMetrics
+    violations: List[str] = field(default_factory=list)
+
+    @property
+    def violation(self) -> Optional[str]:
+        return self.violations[0] if self.violations else None
+
+
+def is_blocked_attribute(name: str) -> bool:
+    # Private and dunder names, and the introspection attributes above.
+    return name.startswith("_") or name in BLOCKED_ATTRIBUTES
+
+
+class _Gate(ast.NodeVisitor):
+    def __init__(self):
+        self.m = CodeMetrics()
+        self.violations: List[str] = []
+        self._loop_depth = 0
+
+    def generic_visit(self, node):
+        loop = isinstance(node, _LOOPS)
+        if loop:
+            self.m.loops += 1
+            self._loop_depth += 1
+            self.m.max_loop_depth = max(self.m.max_loop_depth, self._loop_depth)
+        super().generic_visit(node)
+        if loop:
+            self._loop_depth -= 1
+
+    def visit_Import(self, node):
+        self.violations.append("Imports are disabled in this sandbox")
+    visit_ImportFrom = visit_Import
+
+    def visit_Attribute(self, node):
+        if is_blocked_attribute(node.attr):
+            self.violations.append(f"Access to '{node.attr}' is disabled in this sandbox")
+        self.generic_visit(node)
+
+    def visit_Call(self, node):
+        if (isinstance(node.func, ast.Name) and node.func.id in _NAME_GETTERS and len(node.args) > 1
+                and isinstance(node.args[1], ast.Constant) and isinstance(node.args[1].value, str)
+                and is_blocked_attribute(node.args[1].value)):
+            self.violations.append(f"Access to '{node.args[1].value}' is disabled in this sandbox")
+        self.generic_visit(node)
+
+
+def analyze(source: str, filename: str = "<user_code>") -> Analysis:
+    # One parse per submission; the tree is handed to compile() afterwards.
+    # SyntaxError propagates to the caller.
+    tree = ast.parse(source, filename, "exec")
+    gate = _Gate()
+    gate.visit(tree)
+    return Analysis(tree, gate.m, gate.violations)
@@ -0,0 +1,119 @@
+# Static CSS/HTML for the Streamlit pages, built once per process at import
+# instead of on every script rerun.
+
+# Grid table styles. The page and the grid component's iframe (which cannot
+# see the page's stylesheet) both use them; dark rules are scoped per host.
+GRID_CSS = """
+      .garden { border-collapse: collapse; margin: 0.25rem 0; border: 1px solid #e5e7eb; }
+      .garden th, .garden td { border: 1px solid #e5e7eb; width: 48px; height: 48px; text-align: center; }
+      .garden th.hdr { background: #f8fafc; font-weight: 800; font-size: 12px; color: #334155; width: 32px; }
+      .cell { transition: transform 120ms ease, background 200ms ease; }
+      .cell:hover { transform: scale(1.05); }
+      .cell.empty  { background: #ffffff; }
+      .cell.plant  { background: #f0fdf4; }
+      .cell.water  { background: #eff6ff; }
+      .cell.fert   { background: #fdf4ff; }
+      .cell.rem    { background: #fff1f2; }
+      .emo { display:inline-block; font-size: 32px; line-height: 1; transform: translateY(2px); }
+"""
+
+def _grid_dark_css(scope: str) -> str:
+    return f"""
+    /* table */
+    {scope}.garden {{ border-color:#334155; }}
+    {scope}.garden th, {scope}.garden td {{ border-color:#334155; }}
+    {scope}.garden th.hdr {{ background:#1e293b; color:#f1f5f9; }}
+
+    /* cells */
+    {scope}.cell.empty {{ background:#1e293b; }}
+    {scope}.cell.plant {{ background:#064e3b; }}
+    {scope}.cell.water {{ background:#1e3a8a; }}
+    {scope}.cell.fert  {{ background:#581c87; }}
+    {scope}.cell.rem   {{ background:#7f1d1d; }}
+"""
+
+# Sent with the component's full renders; it toggles body.dark from the theme.
+GRID_COMPONENT_CSS = GRID_CSS + _grid_dark_css("body.dark ")
+
+APP_CSS = ("""
+    <style>
+
+      .stApp {background: radial-gradient(1200px 600px at 0% 0%, #f0fdf4 0%, #ffffff 40%), radial-gradient(1200px 600px at 100% 0%, #eff6ff 0%, transparent 40%), radial-gradient(1200px 600px at 100% 100%, #fff7ed 0%, transparent 40%);} 
+      @keyframes floaty {0%{transform:translateY(0)} 50%{transform:translateY(-10px)} 100%{transform:translateY(0)}}
+      .stMainBlockContainer {max-width:1080px; margin: 12px auto; padding: 10px 14px; border-radius: 18px; background: rgba(255,255,255,0.75); box-shadow: 0 1px 0 rgba(0,0,0,0.02), 0 8px 40px rgba(2,6,23,0.06);} 
+      #python-garden {text-align: center;}
+      
+      .footer {text-align: center; fcolor:#475569; margin-bottom:6px;}
+      .badge {display:inline-block; padding:4px 10px; border-radius:999px; background:#e8f7ee; color:#065f46; font-weight:700; font-size:12px;}
+      .big-emo {font-size: 32px; line-height:1; display:inline-block; padding: 0 6px;}
+      .lbl { color:#334155; font-weight:700; }
+""" + GRID_CSS + """      .subtle { color:#64748b; }
+      .card { border:1px solid #e5e7eb; border-radius: 14px; padding: 12px 14px; background: #ffffffc0; }
+      .card h4{ margin: 0 0 8px 0; color:#0f172a; }
+      .chip{ display:inline-block; padding:4px 10px; border-radius:999px; background:#eef2ff; color:#3730a3; font-weight:700; font-size:12px; margin-right:6px; margin-bottom:6px;}
+      .callout{ border-left:4px solid #22c55e; background:#ecfdf5; padding:10px 12px; border-radius:12px; margin: 8px 0;}
+      .explain-box{ border-left:4px solid #3b82f6; background:#eff6ff; padding:12px 14px; border-radius:12px; margin: 12px 0;}
+      .explain-box h5{ margin: 0 0 6px 0; color:#1e40af; font-size: 14px; font-weight: 700;}
+      .explain-box p{ margin: 4px 0; color:#1e3a8a; font-size: 13px; line-height: 1.5;}
+      .hero{ margin: 4px 0 12px; border-radius: 16px; padding: 14px 16px; color:#0f172a; background: linear-gradient(90deg,#f0fdf4,#ecfeff,#fff7ed); box-shadow: inset 0 0 0 1px #e5e7eb; }
+      .hero-title{ font-size: 20px; font-weight: 800;}
+      .meta{ font-size:12px; color:#475569;}
+      .bg-floaters{ position: fixed; inset: 0; pointer-events:none; z-index:0; }
+      .flo{ position:absolute; opacity:.10; animation: floaty 7s ease-in-out infinite; }
+      .flo-1{ top:5%; left:5%; font-size:72px; animation-delay: 0s;}
+      .flo-2{ top:10%; right:8%; font-size:68px; animation-delay: .6s;}
+      .flo-3{ bottom:8%; left:6%; font-size:74px; animation-delay: 1.1s;}
+      .flo-4{ bottom:12%; right:12%; font-size:70px; animation-delay: 1.6s;}
+      .legend{ margin-bottom:8px;}
+      .example-code{ background:#f8fafc; border:1px solid #e2e8f0; border-radius:8px; padding:8px 10px; font-family:monospace; font-size:13px; margin:6px 0;}
+      .stTextArea textarea {
+            spellcheck: false;
+            -webkit-spellcheck: false;
+            -moz-spellcheck: false;
+            -ms-spellcheck: false;
+        }
+
+      @media (prefers-color-scheme: dark) {
+    .stApp {
+        background: rgb(14, 17, 23);
+    }
+
+    .stMainBlockContainer {
+        background: rgb(14, 17, 23);
+        box-shadow: 0;
+        color: #e2e8f0;
+    }
+
+    /* text */
+    .lbl, .card h4, .hero-title { color: #e2e8f0; }
+    .subtle, .meta { color: #94a3b8; }
+
+    /* card & chips */
+    .card { background:#1e293b; border-color:#334155; }
+    .chip { background:#1e40af; color:#c7d2fe; }
+
+""" + _grid_dark_css("") + """
+    /* code blocks */
+    .example-code { background:#0b1220; border-color:#334155; color:#e5e7eb; }
+
+    /* callouts */
+    .callout { background:#052e16; border-left-color:#22c55e; }
+    .explain-box { background:#0c4a6e; border-left-color:#3b82f6; }
+    .explain-box h5, .explain-box p { color:#dbeafe; }
+
+    }
+    </style>
+    """)
+
+BG_FLOATERS_HTML = """
+<div class='bg-floaters'>
+  <div class='flo flo-1'>🌱</div>
+  <div class='flo flo-2'>💧</div>
+  <div class='flo flo-3'>🌼</div>
+  <div class='flo flo-4'>🧹</div>
+</div>
+"""
+
+API_CALLOUT_HTML = "<div class='callout'>💡 <strong>Ашиглах бэлэн функцууд:</strong> <span class='chip'>water(i)</span> <span class='chip'>fertilize(i)</span> <span class='chip'>remove(i)</span> <span class='chip'>get(i) → dict</span></div>"
+
+RANGE_API_CALLOUT_HTML = "<div class='callout'>🚀 <strong>Том талбайн функцууд:</strong> <span class='chip'>water_range(start, stop, step)</span> <span class='chip'>fertilize_range(start, stop, step)</span> <span class='chip'>remove_range(start, stop, step)</span></div>"
@@ -0,0 +1,50 @@
+import hashlib
+from dataclasses import dataclass
+from types import CodeType
+from typing import Iterable
+
+from garden.analysis import Analysis, analyze
+from garden.cache import LRUCache
+
+USER_FILENAME = "<user_code>"
+
+
+@dataclass
+class Compiled:
+    code: CodeType
+    analysis: Analysis
+
+
+# Process-wide cache of analysed + compiled learner code, keyed by a hash of the source.
+CODE_CACHE: "LRUCache[Compiled]" = LRUCache(maxsize=1024)
+
+
+def source_key(source: str) -> str:
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+def _build(source: str) -> Compiled:
+    analysis = analyze(source, USER_FILENAME)
+    return Compiled(compile(analysis.tree, USER_FILENAME, "exec"), analysis)
+
+def compile_user_code(source: str) -> Compiled:
+    # SyntaxError propagates (and is not cached) so the learner sees it.
+    key = source_key(source)
+    entry = CODE_CACHE.get(key)
+    if entry is None:
+        entry = _build(source)
+        CODE_CACHE.put(key, entry)
+    return entry
+
+def precompile(sources: Iterable[str]) -> int:
+    # Warm the cache with starter snippets; unfinished starters are skipped.
+    n = 0
+    for src in sources:
+        key = source_key(src)
+        if key in CODE_CACHE:
+            continue
+        try:
+            CODE_CACHE.put(key, _build(src))
+            n += 1
+        except SyntaxError:
+            pass
+    return n
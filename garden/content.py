@@ -0,0 +1,341 @@
+# Loads the level TOML files (content/levels, or $GARDEN_CONTENT_DIR) into a
+# Catalog. get_catalog() rebuilds it only when a file changed.
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import os
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import tomllib
+except ModuleNotFoundError:  # Python < 3.11
+    import tomli as tomllib
+
+from garden.codecache import compile_user_code, precompile
+from garden.grid import PackedGrid, make_grid
+from garden.levels import Catalog, Level, Step
+from garden.validators import GridView, Validator, expect, expect_vars
+
+if TYPE_CHECKING:
+    import numpy as np
+
+log = logging.getLogger(__name__)
+
+CONTENT_DIR = os.environ.get("GARDEN_CONTENT_DIR") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "content", "levels")
+
+
+class ContentError(ValueError):
+    """A level file is missing, malformed or refers to an unknown setup/check."""
+
+
+# ==========================
+# Setups: N -> PackedGrid
+# ==========================
+
+def _setup_plants(N: int) -> PackedGrid:
+    return make_grid(N)
+
+def _setup_empty(N: int) -> PackedGrid:
+    return make_grid(N, plant_default=False)
+
+def _setup_plant_cycle(N: int, cycle: List[bool]) -> PackedGrid:
+    return make_grid(N, plant_cycle=cycle)
+
+SETUPS: Dict[str, Callable[..., PackedGrid]] = {
+    "plants": _setup_plants,
+    "empty": _setup_empty,
+    "plant_cycle": _setup_plant_cycle,
+}
+
+# ==========================
+# Selectors: GridView -> (N, N) bool mask
+# ==========================
+
+def _sel_all(g: GridView) -> "np.ndarray":
+    import numpy as np   # lazy, as in garden.validators
+    return np.ones((g.N, g.N), dtype=bool)
+
+def _sel_plants(g: GridView) -> "np.ndarray":
+    return g.plant
+
+def _sel_empty(g: GridView) -> "np.ndarray":
+    return ~g.plant
+
+def _sel_rows(g: GridView, rows: List[int]) -> "np.ndarray":
+    import numpy as np
+    return np.broadcast_to(np.isin(g.r, rows), (g.N, g.N))
+
+def _sel_row_step(g: GridView, start: int = 0, step: int = 1) -> "np.ndarray":
+    import numpy as np
+    return np.broadcast_to((g.r >= start) & ((g.r - start) % step == 0), (g.N, g.N))
+
+def _sel_corners(g: GridView) -> "np.ndarray":
+    n = g.N - 1
+    return g.at(0, n, n * g.N, n * g.N + n)
+
+def _sel_checkerboard(g: GridView) -> "np.ndarray":
+    return (g.r + g.c) % 2 == 0
+
+def _sel_border(g: GridView) -> "np.ndarray":
+    n = g.N - 1
+    return (g.r == 0) | (g.r == n) | (g.c == 0) | (g.c == n)
+
+def _sel_diagonal(g: GridView) -> "np.ndarray":
+    return g.r == g.c
+
+SELECTORS: Dict[str, Callable[..., "np.ndarray"]] = {
+    "all": _sel_all,
+    "plants": _sel_plants,
+    "empty": _sel_empty,
+    "rows": _sel_rows,
+    "row_step": _sel_row_step,
+    "corners": _sel_corners,
+    "checkerboard": _sel_checkerboard,
+    "border": _sel_border,
+    "diagonal": _sel_diagonal,
+}
+
+# ==========================
+# Checks: params -> Validator
+# ==========================
+
+FLAGS = ("plant", "watered", "fertilized", "removed")
+_TYPES: Dict[str, type] = {"str": str, "int": int, "float": float, "bool": bool, "list": list}
+
+def _check_flag(flag: str, select: str, ok: str, fail: str, mode: str = "exact",
+                **select_params: Any) -> Validator:
+    # "exact": the flag is set on the selected tiles and nowhere else.
+    # "covers": the flag is set on every selected tile; others are ignored.
+    if flag not in FLAGS:
+        raise ContentError(f"unknown flag {flag!r}; expected one of {', '.join(FLAGS)}")
+    if mode not in ("exact", "covers"):
+        raise ContentError(f"unknown mode {mode!r}; expected 'exact' or 'covers'")
+    selector = _bind("selector", SELECTORS, select, select_params, leading=1)
+
+    def predicate(g: GridView) -> bool:
+        have, want = getattr(g, flag), selector(g)
+        return (have == want).all() if mode == "exact" else have[want].all()
+    return expect(predicate, ok, fail)
+
+def _same(value: object, expected: object) -> bool:
+    # Booleans are compared by identity so `1` does not pass for `True`.
+    if isinstance(expected, bool):
+        return value is expected
+    return value == expected
+
+_MISSING = object()
+
+def _check_vars(ok: str, fail: str, equals: Optional[Dict[str, Any]] = None,
+                types: Optional[Dict[str, str]] = None) -> Validator:
+    equals, types = dict(equals or {}), dict(types or {})
+    if not equals and not types:
+        raise ContentError("'vars' check needs 'equals' and/or 'types'")
+    for name, t in types.items():
+        if t not in _TYPES:
+            raise ContentError(f"unknown type {t!r} for {name!r}; expected one of {', '.join(_TYPES)}")
+    expected_types = {name: _TYPES[t] for name, t in types.items()}
+
+    def predicate(ns: Dict[str, object]) -> bool:
+        return (all(isinstance(ns.get(k), t) for k, t in expected_types.items())
+                and all(_same(ns.get(k, _MISSING), v) for k, v in equals.items()))
+    return expect_vars(predicate, ok, fail)
+
+CHECKS: Dict[str, Callable[..., Validator]] = {
+    "flag": _check_flag,
+    "vars": _check_vars,
+}
+
+# ==========================
+# Loader
+# ==========================
+
+def _bind(what: str, registry: Dict[str, Callable[..., Any]], name: object,
+          params: Dict[str, Any], leading: int = 0) -> Callable[..., Any]:
+    # Resolve a registry entry and check its parameters now, so a typo in a
+    # level file fails at load time instead of on a learner's first run.
+    fn = registry.get(name) if isinstance(name, str) else None
+    if fn is None:
+        raise ContentError(f"unknown {what} {name!r}; expected one of {', '.join(registry)}")
+    sig = inspect.signature(fn)
+    placeholders = [None] * leading
+    try:
+        sig.bind(*placeholders, **params)
+    except TypeError as e:
+        raise ContentError(f"{what} {name!r}: {e}") from None
+    return functools.partial(fn, **params) if params else fn
+
+def _field(table: Dict[str, Any], key: str, kind: Any, where: str, default: Any = ...) -> Any:
+    if key not in table:
+        if default is ...:
+            raise ContentError(f"{where}: missing '{key}'")
+        return default
+    value = table[key]
+    if not isinstance(value, kind) or (kind is int and isinstance(value, bool)):
+        names = " or ".join(k.__name__ for k in (kind if isinstance(kind, tuple) else (kind,)))
+        raise ContentError(f"{where}: '{key}' must be {names}, got {type(value).__name__}")
+    return value
+
+def _reject_unknown(table: Dict[str, Any], allowed: Tuple[str, ...], where: str) -> None:
+    extra = sorted(set(table) - set(allowed))
+    if extra:
+        raise ContentError(f"{where}: unknown key(s) {', '.join(extra)}")
+
+_LEVEL_KEYS = ("id", "title", "size", "show_grid", "steps")
+_STEP_KEYS = ("title", "description", "explanation", "starter", "hint", "budget", "reads", "panel",
+              "setup", "validator", "solution")
+
+# Variables panels drawn by Main.draw_basics_panel for levels without a grid.
+PANELS = ("name", "states", "counting", "status", "strip")
+
+def _reads(raw: Dict[str, Any], validator: Dict[str, Any], where: str) -> Tuple[str, ...]:
+    # Declared `reads` plus every variable a `vars` check looks at.
+    names = list(_field(raw, "reads", list, where, []))
+    if validator.get("check") == "vars":
+        for key in ("equals", "types"):
+            if isinstance(validator.get(key), dict):
+                names.extend(validator[key])
+    for name in names:
+        if not isinstance(name, str) or not name.isidentifier():
+            raise ContentError(f"{where}: 'reads' entries must be variable names, got {name!r}")
+    return tuple(sorted(set(names)))
+
+def _compile_step(raw: Dict[str, Any], size: int, where: str) -> Step:
+    _reject_unknown(raw, _STEP_KEYS, where)
+    description = _field(raw, "description", (list, str), where)
+    if isinstance(description, str):
+        description = [description]
+    budget = _field(raw, "budget", int, where, None)
+    if budget is not None and budget <= 0:
+        raise ContentError(f"{where}: 'budget' must be positive")
+    panel = _field(raw, "panel", str, where, None)
+    if panel is not None and panel not in PANELS:
+        raise ContentError(f"{where}: unknown panel {panel!r}; expected one of {', '.join(PANELS)}")
+
+    solution = _field(raw, "solution", str, where, "").strip()
+    if solution:
+        try:
+            violation = compile_user_code(solution).analysis.violation
+        except SyntaxError as e:
+            raise ContentError(f"{where}: 'solution' does not compile: {e}") from None
+        if violation:
+            raise ContentError(f"{where}: 'solution' is rejected: {violation}")
+
+    setup = dict(_field(raw, "setup", dict, where))
+    validator = dict(_field(raw, "validator", dict, where))
+    reads = _reads(raw, validator, where)
+    try:
+        setup_fn = _bind("setup", SETUPS, setup.pop("kind", None), setup, leading=1)
+        validator_fn = _bind("check", CHECKS, validator.pop("check", None), validator)()
+    except ContentError as e:
+        raise ContentError(f"{where}: {e}") from None
+
+    # Everything that decides the outcome of a run, hashed: memoized results
+    # survive wording edits but not changes to the grading.
+    digest = hashlib.sha256(json.dumps(
+        [size, budget, reads, raw["setup"], raw["validator"]], sort_keys=True, ensure_ascii=False,
+    ).encode("utf-8")).hexdigest()[:16]
+
+    return Step(
+        title=_field(raw, "title", str, where),
+        description=[str(d) for d in description],
+        explanation=_field(raw, "explanation", str, where).strip(),
+        starter=_field(raw, "starter", str, where).strip(),
+        hint=_field(raw, "hint", str, where),
+        setup=setup_fn,
+        validator=validator_fn,
+        budget=budget,
+        reads=reads,
+        panel=panel,
+        solution=solution,
+        digest=digest,
+    )
+
+def load_level(path: str) -> Level:
+    try:
+        with open(path, "rb") as f:
+            raw = tomllib.load(f)
+    except (OSError, tomllib.TOMLDecodeError) as e:
+        raise ContentError(f"{path}: {e}") from None
+    _reject_unknown(raw, _LEVEL_KEYS, path)
+    size = _field(raw, "size", int, path)
+    if size <= 0:
+        raise ContentError(f"{path}: 'size' must be positive")
+    steps = _field(raw, "steps", list, path)
+    if not steps:
+        raise ContentError(f"{path}: a level needs at least one [[steps]] entry")
+    return Level(
+        id=str(_field(raw, "id", (str, int), path)),
+        title=_field(raw, "title", str, path),
+        size=size,
+        show_grid=_field(raw, "show_grid", bool, path, True),
+        steps=[_compile_step(s, size, f"{path}: steps[{i}]") for i, s in enumerate(steps)],
+    )
+
+def _level_files(directory: str) -> List[str]:
+    try:
+        names = sorted(n for n in os.listdir(directory) if n.endswith(".toml"))
+    except OSError as e:
+        raise ContentError(f"{directory}: {e}") from None
+    return [os.path.join(directory, n) for n in names]
+
+def load_catalog(directory: str = CONTENT_DIR) -> Catalog:
+    levels = [load_level(p) for p in _level_files(directory)]
+    if not levels:
+        raise ContentError(f"{directory}: no level files (*.toml)")
+    seen: Dict[str, str] = {}
+    for lvl in levels:
+        if lvl.id in seen:
+            raise ContentError(f"duplicate level id {lvl.id!r} ({seen[lvl.id]!r} and {lvl.title!r})")
+        seen[lvl.id] = lvl.title
+    catalog = Catalog(levels)
+    precompile(step.starter for step in catalog.steps.values())
+    return catalog
+
+# ==========================
+# Hot-reloading cache
+# ==========================
+
+_Signature = Tuple[Tuple[str, int, int], ...]
+
+_lock = threading.Lock()
+_cached: Dict[str, Tuple[_Signature, Catalog]] = {}
+_errors: Dict[str, str] = {}
+
+def _signature(directory: str) -> _Signature:
+    sig = []
+    for path in _level_files(directory):
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue   # removed between listdir and stat; the next call sees it gone
+        sig.append((path, st.st_mtime_ns, st.st_size))
+    return tuple(sig)
+
+def get_catalog(directory: Optional[str] = None) -> Catalog:
+    """Current catalog for ``directory``, rebuilt only when its files changed."""
+    directory = directory or CONTENT_DIR
+    with _lock:
+        hit = _cached.get(directory)
+        try:
+            sig = _signature(directory)
+            if hit is not None and hit[0] == sig:
+                return hit[1]
+            catalog = load_catalog(directory)
+        except ContentError as e:
+            if hit is None:
+                raise
+            if _errors.get(directory) != str(e):
+                log.warning("keeping previous level content: %s", e)
+            _errors[directory] = str(e)
+            return hit[1]
+        _cached[directory] = (sig, catalog)
+        _errors.pop(directory, None)
+        return catalog
+
+def reload_error(directory: Optional[str] = None) -> Optional[str]:
+    # Set while the files on disk are broken and an older catalog is being served.
+    return _errors.get(directory or CONTENT_DIR)
@@ -0,0 +1,91 @@
+"""Per-session store of the learner's code drafts.
+
+One :class:`DraftStore` lives in each session's state, keyed by editor key
+(``code_L{level}_S{step}``). It is bounded by entry count and bytes and
+evicts the least recently used draft first. A draft equal to the step's
+starter is kept as the :data:`STARTER` sentinel rather than a copy, and
+drafts over ``compress_over`` bytes are kept zlib-compressed.
+"""
+import weakref
+import zlib
+from collections import OrderedDict
+from typing import Dict, Optional, Union
+
+STARTER = None   # "unchanged from the step's starter"
+
+_Stored = Union[None, str, bytes]   # STARTER, plain text, or zlib-compressed UTF-8
+
+_LIVE: "weakref.WeakSet[DraftStore]" = weakref.WeakSet()
+
+
+def _nbytes(value: _Stored) -> int:
+    if value is None:
+        return 0
+    return len(value) if isinstance(value, bytes) else len(value.encode("utf-8"))
+
+def _text(value: Union[str, bytes]) -> str:
+    return zlib.decompress(value).decode("utf-8") if isinstance(value, bytes) else value
+
+
+class DraftStore:
+    def __init__(self, max_drafts: int = 64, max_bytes: int = 256 * 1024, compress_over: int = 1024):
+        self.max_drafts = max_drafts
+        self.max_bytes = max_bytes
+        self.compress_over = compress_over
+        self._items: "OrderedDict[str, _Stored]" = OrderedDict()
+        self.nbytes = 0
+        self.evictions = 0
+        self.version = 0   # bumped on every change; cheap "did anything change" check
+        _LIVE.add(self)
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        _LIVE.add(self)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._items
+
+    def get(self, key: str, starter: str) -> str:
+        value = self._items.get(key)
+        if key in self._items:
+            self._items.move_to_end(key)
+        return starter if value is None else _text(value)
+
+    def put(self, key: str, source: str, starter: Optional[str] = None) -> None:
+        if source == starter:
+            value: _Stored = STARTER
+        else:
+            raw = source.encode("utf-8")
+            value = zlib.compress(raw) if len(raw) > self.compress_over else source
+        if key in self._items:
+            self.nbytes -= _nbytes(self._items.pop(key))
+        self._items[key] = value
+        self.nbytes += _nbytes(value)
+        self.version += 1
+        # The draft just written is never evicted, even if it alone is over budget.
+        while len(self._items) > 1 and (len(self._items) > self.max_drafts or self.nbytes > self.max_bytes):
+            _, old = self._items.popitem(last=False)
+            self.nbytes -= _nbytes(old)
+            self.evictions += 1
+
+    def export(self) -> Dict[str, str]:
+        # Plain text of every draft that differs from its starter (for persistence).
+        return {k: _text(v) for k, v in self._items.items() if v is not None}
+
+    @classmethod
+    def from_dict(cls, drafts: Dict[str, str], **kwargs) -> "DraftStore":
+        store = cls(**kwargs)
+        for key, source in drafts.items():
+            store.put(key, source)
+        return store
+
+    def stats(self) -> Dict[str, int]:
+        return {"drafts": len(self._items), "bytes": self.nbytes, "evictions": self.evictions}
+
+
+def draft_bytes() -> int:
+    # Bytes held by every live DraftStore in this process.
+    return sum(d.nbytes for d in list(_LIVE))
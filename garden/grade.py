@@ -0,0 +1,134 @@
+"""Batch grading of saved submissions.
+
+    python -m garden.grade submissions.jsonl -o results.jsonl --workers 8
+
+Each input line is a JSON object with ``level_id``, ``step_index`` and
+``code``. Every other field (a submission or student id, say) is copied to
+the output line, which adds ``ok``, ``error``, ``message`` and, for runs
+that executed, ``lines``/``calls`` and any (capped) ``output`` they printed. Output keeps input order and is
+written as results arrive. Grading uses :func:`garden.runner.run_user_code`,
+the same path as the Run button, in a pool of processes that each own one
+sandbox worker; ``--no-sandbox`` runs trusted code in-process instead.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, TextIO
+
+from garden import workers
+from garden.content import get_catalog
+from garden.levels import Level
+from garden.runner import run_user_code
+from garden.workers import SandboxPool
+
+# Per grading process: level index and sandbox, set by _init_worker.
+_levels: Dict[str, Level] = {}
+_pool: Optional[SandboxPool] = None
+
+
+def _init_worker(content_dir: Optional[str], sandboxed: bool) -> None:
+    global _levels, _pool
+    _levels = {lvl.id: lvl for lvl in get_catalog(content_dir).levels}
+    _pool = SandboxPool(1) if sandboxed and workers.available() else None
+
+
+def grade_one(record: dict, levels: Dict[str, Level], pool: Optional[SandboxPool] = None) -> dict:
+    out = {k: v for k, v in record.items() if k != "code"}
+    level = levels.get(str(record.get("level_id")))
+    idx, code = record.get("step_index"), record.get("code")
+    if level is None or not isinstance(idx, int) or not 0 <= idx < len(level.steps):
+        out.update(ok=False, message="")
+        out.setdefault("error", "unknown level_id/step_index")   # keep read_jsonl's parse error
+        return out
+    if not isinstance(code, str):
+        out.update(ok=False, error="missing 'code'", message="")
+        return out
+    res, _ = run_user_code(code, level, level.steps[idx], pool=pool)
+    out.update(ok=res.ok, error=res.error, message=res.message)
+    if res.stats is not None:
+        out.update(lines=res.stats.lines, calls=res.stats.calls)
+    if res.output:
+        out["output"] = res.output
+    return out
+
+
+def _grade_chunk(chunk: List[dict]) -> List[dict]:
+    return [grade_one(r, _levels, _pool) for r in chunk]
+
+
+def grade_records(records: Iterable[dict], *, workers: Optional[int] = None, chunksize: int = 100,
+                  content_dir: Optional[str] = None, sandboxed: bool = True) -> Iterator[dict]:
+    """Grade ``records`` in parallel, yielding results in input order.
+
+    At most ``4 * workers`` chunks are in flight, so memory stays flat no
+    matter how long the input is.
+    """
+    workers = workers or os.cpu_count() or 1
+    it = iter(records)
+    pending: Deque[Future] = deque()
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(content_dir, sandboxed)) as ex:
+        while True:
+            while len(pending) < 4 * workers:
+                chunk = list(islice(it, chunksize))
+                if not chunk:
+                    break
+                pending.append(ex.submit(_grade_chunk, chunk))
+            if not pending:
+                return
+            yield from pending.popleft().result()
+
+
+def read_jsonl(f: TextIO) -> Iterator[dict]:
+    # Bad lines become records that grade as errors instead of stopping the run.
+    for n, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            rec = json.loads(line)
+        except ValueError as e:
+            rec = {"line": n, "error": f"invalid JSON: {e}"}
+        if not isinstance(rec, dict):
+            rec = {"line": n, "error": "expected a JSON object"}
+        yield rec
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m garden.grade", description=__doc__.split("\n\n")[0])
+    ap.add_argument("input", help="JSONL submissions ('-' for stdin)")
+    ap.add_argument("-o", "--output", default="-", help="JSONL results (default: stdout)")
+    ap.add_argument("--workers", type=int, default=None, help="grading processes (default: CPU count)")
+    ap.add_argument("--chunksize", type=int, default=100)
+    ap.add_argument("--content-dir", default=None, help="level files (default: content/levels)")
+    ap.add_argument("--no-sandbox", action="store_true", help="run code in the grading processes, without rlimits")
+    args = ap.parse_args(argv)
+
+    n_workers = args.workers or os.cpu_count() or 1
+    fin = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    fout = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    counts: Dict[str, int] = {"ok": 0, "failed": 0, "error": 0}
+    start = time.perf_counter()
+    try:
+        for res in grade_records(read_jsonl(fin), workers=n_workers, chunksize=args.chunksize,
+                                 content_dir=args.content_dir, sandboxed=not args.no_sandbox):
+            counts["ok" if res.get("ok") else "error" if res.get("error") else "failed"] += 1
+            fout.write(json.dumps(res, ensure_ascii=False) + "\n")
+    finally:
+        if fin is not sys.stdin:
+            fin.close()
+        if fout is not sys.stdout:
+            fout.close()
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    rate = total / elapsed if elapsed > 0 else 0.0
+    print(f"graded {total} submissions in {elapsed:.1f}s: {rate:.0f}/s, {rate / n_workers:.0f}/s per worker "
+          f"({counts['ok']} passed, {counts['failed']} failed, {counts['error']} errors)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
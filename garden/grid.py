@@ -0,0 +1,124 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence
+
+# ==========================
+# Tile view
+# ==========================
+@dataclass
+class Tile:
+    plant: bool
+    watered: bool
+    fertilized: bool
+    removed: bool
+
+# ==========================
+# Bit layout (one byte per tile)
+# ==========================
+PLANT_BIT = 0b0001
+WATERED_BIT = 0b0010
+FERTILIZED_BIT = 0b0100
+REMOVED_BIT = 0b1000
+
+
+def pack_tile(t: Tile) -> int:
+    return ((PLANT_BIT if t.plant else 0) | (WATERED_BIT if t.watered else 0) |
+            (FERTILIZED_BIT if t.fertilized else 0) | (REMOVED_BIT if t.removed else 0))
+
+def unpack_tile(b: int) -> Tile:
+    return Tile(plant=bool(b & PLANT_BIT), watered=bool(b & WATERED_BIT),
+                fertilized=bool(b & FERTILIZED_BIT), removed=bool(b & REMOVED_BIT))
+
+# bytes.translate tables, so whole-grid operations run at C speed.
+@lru_cache(maxsize=None)
+def _mask_table(bit: int) -> bytes:
+    return bytes(1 if b & bit else 0 for b in range(256))
+
+@lru_cache(maxsize=None)
+def _or_table(bit: int) -> bytes:
+    return bytes(b | bit for b in range(256))
+
+def clamp_range(n: int, start: int, stop: int, step: int = 1) -> range:
+    # Indices of range(start, stop, step) that fall inside [0, n).
+    if step <= 0:
+        raise ValueError("step must be positive")
+    if start < 0:
+        start += -(start // step) * step
+    return range(start, min(stop, n), step)
+
+
+class PackedGrid:
+    """N*N garden stored as one flag byte per tile.
+
+    ``grid[i]`` returns a fresh :class:`Tile` built from the flags, so code
+    written against ``List[Tile]`` (validators, renderers) keeps working.
+    Assigning a ``Tile`` packs it back into the byte array.
+    """
+
+    __slots__ = ("size", "data")
+
+    def __init__(self, size: int, data: Optional[bytearray] = None):
+        self.size = size
+        self.data = bytearray(size * size) if data is None else bytearray(data)
+        if len(self.data) != size * size:
+            raise ValueError(f"expected {size * size} tiles, got {len(self.data)}")
+
+    @classmethod
+    def from_tiles(cls, size: int, tiles: Iterable[Tile]) -> "PackedGrid":
+        return cls(size, bytearray(pack_tile(t) for t in tiles))
+
+    def copy(self) -> "PackedGrid":
+        return PackedGrid(self.size, self.data)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __getitem__(self, i: int) -> Tile:
+        return unpack_tile(self.data[i])
+
+    def __setitem__(self, i: int, t: Tile) -> None:
+        self.data[i] = pack_tile(t)
+
+    def __iter__(self) -> Iterator[Tile]:
+        return map(unpack_tile, self.data)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, PackedGrid):
+            return self.size == other.size and self.data == other.data
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"PackedGrid(size={self.size})"
+
+    def to_list(self) -> List[Tile]:
+        return list(self)
+
+    def mask(self, bit: int) -> bytearray:
+        # One byte per tile: 1 where any of `bit` is set, else 0.
+        return self.data.translate(_mask_table(bit))
+
+    def count(self, bit: int) -> int:
+        return self.mask(bit).count(1)
+
+    def set_flags(self, bit: int, start: int = 0, stop: Optional[int] = None, step: int = 1) -> None:
+        r = clamp_range(len(self.data), start, len(self.data) if stop is None else stop, step)
+        if r:
+            sl = slice(r.start, r.stop, r.step)
+            self.data[sl] = self.data[sl].translate(_or_table(bit))
+
+# ==========================
+# Constructors
+# ==========================
+
+def make_grid(N: int, *, plant_default: bool = True,
+              plant_where: Optional[Callable[[int], bool]] = None,
+              plant_cycle: Optional[Sequence[bool]] = None) -> PackedGrid:
+    # plant_cycle repeats over tile indices, e.g. [True, False] plants every
+    # even index; it is built by bytes repetition, so it stays cheap at N=1000.
+    if plant_cycle is not None:
+        unit = bytes(PLANT_BIT if p else 0 for p in plant_cycle)
+        reps = -(-(N * N) // len(unit))
+        return PackedGrid(N, (unit * reps)[:N * N])
+    if plant_where is None:
+        return PackedGrid(N, bytes([PLANT_BIT if plant_default else 0]) * (N * N))
+    return PackedGrid(N, bytearray(PLANT_BIT if plant_where(i) else 0 for i in range(N * N)))
@@ -0,0 +1,162 @@
+# Per-step run history for undo/redo. Each run is kept as a compact delta
+# against the step's setup; identical grid states and sources are stored once.
+import hashlib
+import threading
+import weakref
+import zlib
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from garden.grid import FERTILIZED_BIT, PLANT_BIT, REMOVED_BIT, WATERED_BIT, PackedGrid
+from garden.render import grid_fingerprint
+from garden.sandbox import GridDiff
+
+# Runs and bytes (deltas plus compressed code) kept per step; the oldest
+# runs are dropped first, but never the newest one.
+HISTORY_LIMIT = 30
+HISTORY_MAX_BYTES = 256 * 1024
+
+FLAG_BITS = (("plant", PLANT_BIT), ("watered", WATERED_BIT), ("fertilized", FERTILIZED_BIT),
+             ("removed", REMOVED_BIT))
+
+
+class Delta:
+    __slots__ = ("indices", "values", "full", "__weakref__")
+
+    def __init__(self, diff: GridDiff):
+        if isinstance(diff, (bytes, bytearray)):
+            self.indices, self.values, self.full = b"", b"", zlib.compress(bytes(diff), 1)
+        else:
+            self.indices = array("I", [i for i, _ in diff]).tobytes()
+            self.values = bytes(b for _, b in diff)
+            self.full = b""
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.indices) + len(self.values) + len(self.full)
+
+    def apply(self, grid: PackedGrid) -> None:
+        # `grid` must be the step's setup.
+        data = grid.data
+        if self.full:
+            data[:] = zlib.decompress(self.full)
+            return
+        for i, b in zip(array("I", self.indices), self.values):
+            data[i] = b
+
+
+# (grid key, fingerprint) -> Delta, for as long as some history holds it.
+_interned: "weakref.WeakValueDictionary[Tuple[str, str], Delta]" = weakref.WeakValueDictionary()
+_intern_lock = threading.Lock()
+
+def _intern(grid_key: str, fingerprint: str, diff: GridDiff) -> Delta:
+    key = (grid_key, fingerprint)
+    delta = _interned.get(key)
+    if delta is None:
+        new = Delta(diff)   # packed outside the lock
+        with _intern_lock:
+            delta = _interned.setdefault(key, new)
+    return delta
+
+
+def flag_changes(before: bytes, after: bytes) -> Tuple[int, Dict[str, Tuple[int, int]]]:
+    """Tiles that differ, and per flag the tiles that gained / lost it."""
+    n = len(after)
+    if len(before) != n:
+        return n, {}
+    if before == after:
+        return 0, {}
+    import numpy as np   # lazy, as in garden.validators
+
+    # Tiles fit in 4 bits: count each (before, after) pair once, then
+    # tally the at most 256 distinct pairs instead of every tile.
+    pairs = (np.frombuffer(before, np.uint8) << 4) | np.frombuffer(after, np.uint8)
+    changed = 0
+    gained = dict.fromkeys((name for name, _ in FLAG_BITS), 0)
+    lost = dict(gained)
+    for v, count in enumerate(np.bincount(pairs, minlength=256).tolist()):
+        x, y = v >> 4, v & 0xF
+        if not count or x == y:
+            continue
+        changed += count
+        for name, bit in FLAG_BITS:
+            if y & bit and not x & bit:
+                gained[name] += count
+            elif x & bit and not y & bit:
+                lost[name] += count
+    return changed, {name: (gained[name], lost[name]) for name, _ in FLAG_BITS if gained[name] or lost[name]}
+
+
+@dataclass
+class Entry:
+    fingerprint: str
+    source_key: str   # into RunHistory's compressed sources
+    ok: bool
+    namespace: Dict[str, object] = field(default_factory=dict)   # last_ns after the run
+    changed: int = 0                                              # tiles changed from the grid shown before
+    changes: Dict[str, Tuple[int, int]] = field(default_factory=dict)   # flag -> (gained, lost), likewise
+
+
+class RunHistory:
+    def __init__(self, grid_key: str, limit: int = HISTORY_LIMIT, max_bytes: int = HISTORY_MAX_BYTES):
+        self.grid_key = grid_key
+        self.limit = limit
+        self.max_bytes = max_bytes
+        self.entries: List[Entry] = []
+        self.pos = -1                          # entry shown; -1 is the step's setup
+        self._states: Dict[str, Delta] = {}    # fingerprint -> delta, each state once
+        self._sources: Dict[str, bytes] = {}   # source hash -> zlib-compressed source, each once
+        self.nbytes = 0                        # deltas plus compressed sources held
+
+    def record(self, before: bytes, grid: PackedGrid, diff: GridDiff, source: str, ok: bool,
+               namespace: Dict[str, object]) -> Entry:
+        """Append a run that turned ``before`` into ``grid`` (``diff`` against the setup) and show it."""
+        fp = grid_fingerprint(grid)
+        source_key = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        last = self.entries[-1] if self.entries else None
+        if last is not None and last.fingerprint == fp and last.source_key == source_key:
+            self.pos = len(self.entries) - 1   # the same run again
+            return last
+        if fp not in self._states:
+            delta = self._states[fp] = _intern(self.grid_key, fp, diff)
+            self.nbytes += delta.nbytes
+        if source_key not in self._sources:
+            packed = self._sources[source_key] = zlib.compress(source.encode("utf-8"))
+            self.nbytes += len(packed)
+        changed, changes = flag_changes(before, grid.data)
+        entry = Entry(fp, source_key, ok, namespace, changed, changes)
+        self.entries.append(entry)
+        while len(self.entries) > 1 and (len(self.entries) > self.limit or self.nbytes > self.max_bytes):
+            self._drop_oldest()
+        self.pos = len(self.entries) - 1
+        return entry
+
+    def _drop_oldest(self) -> None:
+        dropped = self.entries.pop(0)
+        if all(e.fingerprint != dropped.fingerprint for e in self.entries):
+            self.nbytes -= self._states.pop(dropped.fingerprint).nbytes
+        if all(e.source_key != dropped.source_key for e in self.entries):
+            self.nbytes -= len(self._sources.pop(dropped.source_key))
+
+    def source(self, entry: Entry) -> str:
+        return zlib.decompress(self._sources[entry.source_key]).decode("utf-8")
+
+    @property
+    def current(self) -> Optional[Entry]:
+        return self.entries[self.pos] if self.pos >= 0 else None
+
+    @property
+    def can_undo(self) -> bool:
+        return self.pos >= 0
+
+    @property
+    def can_redo(self) -> bool:
+        return self.pos < len(self.entries) - 1
+
+    def restore(self, pos: int, setup: PackedGrid) -> PackedGrid:
+        # Turn `setup` into the grid of entry `pos` (-1: leave it) and show that entry.
+        if pos >= 0:
+            self._states[self.entries[pos].fingerprint].apply(setup)
+        self.pos = pos
+        return setup
@@ -0,0 +1,114 @@
+"""Background runs with live progress, for front-ends that must not block.
+
+:func:`submit` starts :func:`garden.runner.run_user_code` on a thread and
+returns a :class:`RunHandle` straight away. While the code executes, the
+handle keeps a live copy of the grid (updated from the sandbox's progress
+diffs), the output printed so far and the latest line/call counts, so a UI
+can redraw them on a timer;
+:meth:`RunHandle.cancel` stops the run. :func:`finish` applies a completed
+run to the learner's :class:`~garden.state.GardenState`, unless they have
+moved to another step since.
+"""
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from garden import metrics
+from garden.grid import PackedGrid
+from garden.levels import Catalog
+from garden.meter import ExecStats
+from garden.results import RESULT_CACHE, ResultCache, RunResult
+from garden.runner import run_user_code
+from garden.sandbox import CANCEL_MESSAGE, GridDiff, apply_diff
+from garden.state import GardenState
+from garden.workers import SandboxPool
+
+# Threads mostly wait on a sandbox worker, so there can be more than CPUs.
+_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("GARDEN_RUN_THREADS", "0")) or 32,
+                               thread_name_prefix="garden-run")
+
+
+class RunHandle:
+    def __init__(self, grid_key: str, editor_key: str, grid: PackedGrid, source: str = ""):
+        self.grid_key = grid_key          # setup the run started from
+        self.editor_key = editor_key
+        self.source = source
+        self.live = grid.copy()           # grid as of the latest progress report
+        self.stats: Optional[ExecStats] = None
+        self.output = ""                  # print() output so far
+        self.updates = 0                  # progress reports received
+        self.started = time.monotonic()
+        self._cancel = threading.Event()
+        self._future: Optional[Future] = None
+
+    def _on_progress(self, diff: GridDiff, stats: ExecStats, output: Optional[str]) -> None:
+        apply_diff(self.live, diff)
+        self.stats = stats
+        if output is not None:
+            self.output = output
+        self.updates += 1
+
+    def applies_to(self, state: GardenState) -> bool:
+        # False once the learner is on another step or the step's content changed.
+        return state.grid_key == self.grid_key and state.editor_key == self.editor_key
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    def done(self) -> bool:
+        return self._future.done()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        # True once the run has finished.
+        try:
+            self._future.result(timeout)
+        except Exception:
+            pass
+        return self._future.done()
+
+    def result(self) -> Tuple[RunResult, PackedGrid]:
+        return self._future.result()
+
+
+def submit(state: GardenState, catalog: Catalog, source: str, *, pool: Optional[SandboxPool] = None,
+           cache: Optional[ResultCache] = RESULT_CACHE) -> RunHandle:
+    """Start running ``source`` for the learner's current step in the background.
+
+    The draft is saved now; the grid and snapshot change only in :func:`finish`.
+    """
+    state.sync(catalog)
+    level, step = state.level(catalog), state.step(catalog)
+    state.drafts.put(state.editor_key, source, step.starter)
+    with metrics.span("setup"):
+        grid = step.setup(level.size)
+    handle = RunHandle(state.grid_key, state.editor_key, grid, source)
+    handle._future = _executor.submit(run_user_code, source, level, step, grid, pool=pool, cache=cache,
+                                      on_progress=handle._on_progress, cancel=handle._cancel)
+    return handle
+
+
+def finish(state: GardenState, handle: RunHandle) -> Optional[RunResult]:
+    """Apply a finished run to ``state``.
+
+    Returns None, leaving ``state`` untouched, when the learner has moved
+    to another step (or the step's content changed) since the run started.
+    """
+    res, grid = handle.result()
+    if not handle.applies_to(state):
+        return None
+    state.apply_run(res, grid, handle.source)
+    return res
+
+
+def is_cancelled(res: RunResult) -> bool:
+    return res.error == CANCEL_MESSAGE
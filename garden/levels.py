@@ -0,0 +1,47 @@
+# Level data structures and the indexed catalog. The content itself lives in
+# TOML files and is compiled by garden.content; call get_catalog() there on
+# each rerun rather than holding on to a Catalog.
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from garden.grid import PackedGrid
+from garden.validators import Validator
+
+# ==========================
+# Data structures
+# ==========================
+@dataclass
+class Step:
+    title: str
+    description: List[str]
+    explanation: str
+    starter: str
+    hint: str
+    setup: Callable[[int], PackedGrid]
+    validator: Validator
+    budget: Optional[int] = None   # max traced lines per run; DEFAULT_STEP_BUDGET when unset
+    reads: Tuple[str, ...] = ()    # learner variables kept after a run (validator + panel)
+    panel: Optional[str] = None    # variables panel shown when the level hides the grid
+    solution: str = ""             # reference solution; see garden.selfcheck
+    digest: str = ""               # hash of size, budget, reads, setup and validator specs
+
+@dataclass
+class Level:
+    id: str
+    title: str
+    size: int
+    show_grid: bool
+    steps: List[Step]
+
+# ==========================
+# Index
+# ==========================
+class Catalog:
+    def __init__(self, levels: List[Level]):
+        self.levels = levels
+        self.steps: Dict[Tuple[int, int], Step] = {
+            (li, si): step for li, lvl in enumerate(levels) for si, step in enumerate(lvl.steps)
+        }
+
+    def get_step(self, level_idx: int, step_idx: int) -> Step:
+        return self.steps[(level_idx, step_idx)]
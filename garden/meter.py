@@ -0,0 +1,131 @@
+"""Opt-in line/call metering for learner code via ``sys.settrace``.
+
+Only frames whose code was compiled from learner source are traced, so
+the grid API and builtins add no line events. Once ``max_lines`` is
+exceeded the trace function raises :class:`BudgetExceeded` into the
+learner's frame. An optional ``on_progress`` hook is called with the
+running stats every ``progress_every`` lines; it may raise to stop the run.
+
+A backward jump to the same line (``while True: pass``, a one-line
+comprehension) raises no "line" event, so frames whose code has one also
+trace opcodes: each such jump, and every ``OPCODES_PER_LINE`` opcodes,
+counts as a line.
+"""
+import dis
+import sys
+import weakref
+from dataclasses import dataclass
+from types import CodeType
+from typing import Callable, FrozenSet, Optional
+
+from garden.codecache import USER_FILENAME
+from garden.sandbox import BudgetExceeded
+
+# Line events allowed per run when a step does not set its own budget.
+DEFAULT_STEP_BUDGET = 200_000
+
+# Line events between progress callbacks.
+PROGRESS_EVERY = 1000
+
+# Opcodes charged as one line in frames traced per opcode, so a long
+# one-line loop body costs in proportion to its work.
+OPCODES_PER_LINE = 8
+
+
+_JUMPS = frozenset(dis.hasjrel) | frozenset(dis.hasjabs)
+_tight_loops_cache: "weakref.WeakKeyDictionary[CodeType, FrozenSet[int]]" = weakref.WeakKeyDictionary()
+
+def _tight_loops(code: CodeType) -> FrozenSet[int]:
+    # Offsets of backward jumps that land on their own line.
+    found = _tight_loops_cache.get(code)
+    if found is None:
+        line_at = {}
+        for start, end, line in code.co_lines():
+            for offset in range(start, end, 2):
+                line_at[offset] = line
+        found = frozenset(
+            ins.offset for ins in dis.get_instructions(code)
+            if ins.opcode in _JUMPS and isinstance(ins.argval, int) and ins.argval <= ins.offset
+            and line_at.get(ins.argval) == line_at.get(ins.offset))
+        _tight_loops_cache[code] = found
+    return found
+
+
+@dataclass
+class ExecStats:
+    lines: int = 0
+    calls: int = 0
+    budget: Optional[int] = None
+    exceeded: bool = False
+
+
+class ExecutionMeter:
+    def __init__(self, max_lines: Optional[int] = None, filename: str = USER_FILENAME,
+                 on_progress: Optional[Callable[[ExecStats], None]] = None,
+                 progress_every: int = PROGRESS_EVERY):
+        self.stats = ExecStats(budget=max_lines)
+        self._filename = filename
+        self._prev = None
+        self._on_progress = on_progress
+        self._progress_every = progress_every
+        self._opcodes = 0   # since the last line charged for opcodes
+        self._jumps_code: Optional[CodeType] = None   # _tight_loops() of the last opcode-traced code
+        self._jumps: FrozenSet[int] = frozenset()
+        # One comparison per line covers both the budget and the progress hook.
+        self._check_at = self._next_check()
+
+    def _next_check(self) -> int:
+        st = self.stats
+        limit = st.budget if st.budget is not None else sys.maxsize
+        if self._on_progress is not None:
+            limit = min(limit, st.lines + self._progress_every)
+        return limit
+
+    def __enter__(self) -> "ExecutionMeter":
+        self._prev = sys.gettrace()
+        sys.settrace(self._trace_call)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        sys.settrace(self._prev)
+
+    def _trace_call(self, frame, event, arg):
+        if event != "call":
+            return None
+        caller = frame.f_back
+        if caller is not None and caller.f_code.co_filename == self._filename:
+            # A call made from learner code: a learner function or the grid API.
+            self.stats.calls += 1
+        if frame.f_code.co_filename == self._filename:
+            if _tight_loops(frame.f_code):
+                frame.f_trace_opcodes = True
+            return self._trace_line
+        return None
+
+    def _trace_line(self, frame, event, arg):
+        if event == "line":
+            st = self.stats
+            st.lines += 1
+            if st.lines > self._check_at:
+                self._check()
+        elif event == "opcode":
+            self._opcodes += 1
+            code = frame.f_code
+            if code is not self._jumps_code:
+                self._jumps_code, self._jumps = code, _tight_loops(code)
+            if self._opcodes >= OPCODES_PER_LINE or frame.f_lasti in self._jumps:
+                self._opcodes = 0
+                st = self.stats
+                st.lines += 1
+                if st.lines > self._check_at:
+                    self._check()
+        return self._trace_line
+
+    def _check(self) -> None:
+        st = self.stats
+        if st.budget is not None and st.lines > st.budget:
+            st.exceeded = True
+            raise BudgetExceeded()
+        self._check_at = self._next_check()
+        if self._on_progress is not None:
+            self._on_progress(st)
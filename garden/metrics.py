@@ -0,0 +1,261 @@
+# In-process stage timings (metrics.span), Prometheus export and a one-shot
+# cProfile capture. Timing is off unless GARDEN_METRICS=1 or enable() is called.
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import cProfile
+
+# Upper bounds in seconds, as Prometheus `le` labels; the last bucket is +Inf.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_enabled = os.environ.get("GARDEN_METRICS", "0") not in ("", "0")
+
+
+def enable(on: bool = True) -> None:
+    global _enabled
+    _enabled = on
+
+def enabled() -> bool:
+    return _enabled
+
+# ==========================
+# Histograms
+# ==========================
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += seconds
+
+    def quantile(self, q: float) -> float:
+        # Estimated by linear interpolation inside the bucket holding the q-th sample.
+        with self._lock:
+            counts, total = list(self.counts), self.count
+        if not total:
+            return 0.0
+        rank, seen = q * total, 0
+        for i, c in enumerate(counts):
+            if c and seen + c >= rank:
+                lo = self.buckets[i - 1] if i else 0.0
+                hi = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lo + (hi - lo) * (rank - seen) / c
+            seen += c
+        return self.buckets[-1]
+
+    def summary(self) -> Dict[str, float]:
+        # Milliseconds, for tables.
+        return {"count": self.count, "mean_ms": 1000 * self.sum / self.count if self.count else 0.0,
+                "p50_ms": 1000 * self.quantile(0.5), "p90_ms": 1000 * self.quantile(0.9),
+                "p99_ms": 1000 * self.quantile(0.99)}
+
+
+_histograms: Dict[str, Histogram] = {}
+_registry_lock = threading.Lock()
+
+def histogram(stage: str) -> Histogram:
+    h = _histograms.get(stage)
+    if h is None:
+        with _registry_lock:
+            h = _histograms.setdefault(stage, Histogram())
+    return h
+
+def histograms() -> Dict[str, Histogram]:
+    return dict(sorted(_histograms.items()))
+
+def reset() -> None:
+    with _registry_lock:
+        _histograms.clear()
+
+# ==========================
+# Spans
+# ==========================
+
+class Timer:
+    # Started by start(); stop() records once, later calls are no-ops.
+    __slots__ = ("stage", "t0")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.t0 = time.perf_counter()
+
+    def stop(self) -> None:
+        if self.t0 is not None:
+            histogram(self.stage).observe(time.perf_counter() - self.t0)
+            self.t0 = None
+
+    def __enter__(self) -> "Timer":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+class _NoopTimer:
+    __slots__ = ()
+
+    def stop(self) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopTimer":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+_NOOP = _NoopTimer()
+
+_local = threading.local()
+
+def start(stage: str):
+    if not _enabled or getattr(_local, "muted", False):
+        return _NOOP
+    return Timer(stage)
+
+@contextmanager
+def muted():
+    # Spans on this thread are no-ops inside, for background work that is not a rerun.
+    was = getattr(_local, "muted", False)
+    _local.muted = True
+    try:
+        yield
+    finally:
+        _local.muted = was
+
+# A span is a timer used as a context manager.
+span = start
+
+# ==========================
+# Gauges and export
+# ==========================
+
+def gauges() -> Dict[str, float]:
+    # Point-in-time engine figures; imported here so this module stays light.
+    from garden.codecache import CODE_CACHE
+    from garden.drafts import draft_bytes
+    from garden.render import HTML_CACHE
+    from garden.results import RESULT_CACHE
+    from garden.store import default_store
+
+    out: Dict[str, float] = {"draft_bytes": draft_bytes()}
+    for name, stats in (("code_cache", CODE_CACHE.stats()), ("html_cache", HTML_CACHE.stats()),
+                        ("result_cache", RESULT_CACHE.stats())):
+        out.update({f"{name}_{k}": v for k, v in stats.items()})
+    store = default_store()
+    if store is not None:
+        out.update({f"session_store_{k}": v for k, v in store.stats().items()})
+    return out
+
+def prometheus_text() -> str:
+    lines: List[str] = [
+        "# HELP garden_stage_seconds Time spent per stage of a rerun or run.",
+        "# TYPE garden_stage_seconds histogram",
+    ]
+    for stage, h in histograms().items():
+        with h._lock:
+            counts, count, total = list(h.counts), h.count, h.sum
+        cum = 0
+        for le, c in zip([*map(repr, h.buckets), "+Inf"], counts):
+            cum += c
+            lines.append(f'garden_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {cum}')
+        lines.append(f'garden_stage_seconds_sum{{stage="{stage}"}} {total}')
+        lines.append(f'garden_stage_seconds_count{{stage="{stage}"}} {count}')
+    for name, value in sorted(gauges().items()):
+        lines.append(f"# TYPE garden_{name} gauge")
+        lines.append(f"garden_{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+_server_lock = threading.Lock()
+_server = None
+
+def serve(port: int, host: str = "127.0.0.1") -> None:
+    # Serve prometheus_text() at /metrics from a daemon thread; once per process.
+    global _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    with _server_lock:
+        if _server is not None:
+            return
+        _server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=_server.serve_forever, name="garden-metrics", daemon=True).start()
+
+# ==========================
+# One-shot profiling
+# ==========================
+
+_profile_lock = threading.Lock()
+_armed = False
+_active: "Optional[cProfile.Profile]" = None
+_last_profile: Optional[Tuple[float, str]] = None   # (wall time, pstats report)
+
+def arm_profile() -> None:
+    global _armed
+    with _profile_lock:
+        _armed = True
+
+def profile_armed() -> bool:
+    return _armed
+
+def start_profile() -> "Optional[cProfile.Profile]":
+    # The first caller after arm_profile() gets a running profiler; everyone else None.
+    global _armed, _active
+    with _profile_lock:
+        if not _armed:
+            return None
+        _armed = False
+        if _active is not None:   # left running by a rerun that raised
+            _active.disable()
+        import cProfile   # only once a profile is armed; keeps app start light
+        _active = cProfile.Profile()
+    try:
+        _active.enable()
+    except ValueError:   # another profiler is already running in this thread
+        _active = None
+    return _active
+
+def stop_profile(prof: "Optional[cProfile.Profile]", limit: int = 40) -> None:
+    # Safe to call more than once; only the first call for `prof` records.
+    global _active, _last_profile
+    with _profile_lock:
+        if prof is None or _active is not prof:
+            return
+        _active = None
+    prof.disable()
+    import io
+    import pstats
+    out = io.StringIO()
+    pstats.Stats(prof, stream=out).sort_stats("cumulative").print_stats(limit)
+    _last_profile = (time.time(), out.getvalue())
+
+def last_profile() -> Optional[Tuple[float, str]]:
+    return _last_profile
@@ -0,0 +1,126 @@
+import hashlib
+from typing import List, Tuple
+
+from garden.cache import LRUCache
+from garden.grid import PackedGrid, PLANT_BIT, WATERED_BIT, FERTILIZED_BIT, REMOVED_BIT, Tile
+
+# ==========================
+# Emoji
+# ==========================
+EMPTY = "⬜"
+PLANT = "🌱"
+WATER = "💧"
+FERTILIZED = "🌼"
+REMOVED = "🧹"
+OK = "✅"
+NO = "🚫"
+SPARKLE = "✨"
+WITHER = "🥀"
+
+# ==========================
+# Cell symbols
+# ==========================
+
+def _symbol_for_flags(b: int) -> Tuple[str, str]:
+    if b & REMOVED_BIT:
+        return REMOVED, "rem"
+    if b & FERTILIZED_BIT:
+        return FERTILIZED, "fert"
+    if b & WATERED_BIT:
+        return WATER, "water"
+    if b & PLANT_BIT:
+        return PLANT, "plant"
+    return EMPTY, "empty"
+
+# All 16 flag combinations, so rendering a cell is a tuple lookup.
+SYMBOLS: Tuple[Tuple[str, str], ...] = tuple(_symbol_for_flags(b) for b in range(16))
+
+def symbol_for_tile(t: Tile) -> Tuple[str, str]:
+    return _symbol_for_flags((PLANT_BIT if t.plant else 0) | (WATERED_BIT if t.watered else 0) |
+                             (FERTILIZED_BIT if t.fertilized else 0) | (REMOVED_BIT if t.removed else 0))
+
+# ==========================
+# HTML
+# ==========================
+
+def grid_fingerprint(grid: PackedGrid) -> str:
+    return f"{grid.size}:{hashlib.blake2b(grid.data, digest_size=12).hexdigest()}"
+
+def _cell_html(idx: int, N: int, b: int) -> str:
+    emo, cls = SYMBOLS[b & 0xF]
+    return f'<td id="c{idx}" class="cell {cls}" title="r{idx // N},c{idx % N} • idx {idx}"><span class="emo">{emo}</span></td>'
+
+def _build_grid_html(grid: PackedGrid, r0: int = 0, c0: int = 0, rows: int = 0, cols: int = 0) -> str:
+    # Whole grid by default, or the rows x cols window starting at (r0, c0).
+    N, data = grid.size, grid.data
+    r1 = min(N, r0 + rows) if rows else N
+    c1 = min(N, c0 + cols) if cols else N
+    header_cells = ''.join([f'<th class="hdr">{c}</th>' for c in range(c0, c1)])
+    rows_html = []
+    for r in range(r0, r1):
+        cells = ''.join([_cell_html(r*N + c, N, data[r*N + c]) for c in range(c0, c1)])
+        rows_html.append(f'<tr><th class="hdr">{r}</th>{cells}</tr>')
+    return f'''
+    <table class="garden">
+      <thead>
+        <tr>
+          <th class="hdr"></th>
+          {header_cells}
+        </tr>
+      </thead>
+      <tbody>
+        {''.join(rows_html)}
+      </tbody>
+    </table>
+    '''
+
+# Gardens wider than VIEWPORT_THRESHOLD are shown as an overview heatmap
+# plus a VIEWPORT_SIZE-square window instead of one <td> per tile.
+VIEWPORT_THRESHOLD = 25
+VIEWPORT_SIZE = 12
+
+# Rendered tables keyed by grid fingerprint, shared by all sessions.
+HTML_CACHE: "LRUCache[str]" = LRUCache(maxsize=512)
+
+def render_grid_html(grid: PackedGrid) -> str:
+    fp = grid_fingerprint(grid)
+    html = HTML_CACHE.get(fp)
+    if html is None:
+        html = _build_grid_html(grid)
+        HTML_CACHE.put(fp, html)
+    return html
+
+def render_window_html(grid: PackedGrid, r0: int, c0: int, rows: int, cols: int) -> str:
+    key = (grid_fingerprint(grid), r0, c0, rows, cols)
+    html = HTML_CACHE.get(key)
+    if html is None:
+        html = _build_grid_html(grid, r0, c0, rows, cols)
+        HTML_CACHE.put(key, html)
+    return html
+
+# ==========================
+# Heatmap (large gardens)
+# ==========================
+# Palette index per flag byte, in SYMBOLS priority: empty, plant, water, fert, removed.
+_CLASS_ORDER = ("empty", "plant", "water", "fert", "rem")
+_CLASS_TABLE = bytes(_CLASS_ORDER.index(SYMBOLS[b & 0xF][1]) for b in range(256))
+HEATMAP_PALETTE = (
+    0xe5, 0xe7, 0xeb,   # empty
+    0x86, 0xef, 0xac,   # plant
+    0x60, 0xa5, 0xfa,   # watered
+    0xe8, 0x79, 0xf9,   # fertilized
+    0xfb, 0x71, 0x85,   # removed
+)
+
+def heatmap(grid: PackedGrid, max_side: int = 250) -> Tuple[int, int, bytes]:
+    # Nearest-neighbour downsample to at most max_side x max_side palette
+    # indices; returns (side, stride, pixels). Rows are sliced, not iterated.
+    N, data = grid.size, grid.data
+    stride = max(1, -(-N // max_side))
+    picked = b"".join(data[r*N:(r+1)*N:stride] for r in range(0, N, stride))
+    return len(range(0, N, stride)), stride, picked.translate(_CLASS_TABLE)
+
+def cell_updates(before: bytes, after: bytes) -> List[Tuple[int, str, str]]:
+    # (idx, css class, emoji) for every cell whose symbol changed.
+    return [(i, SYMBOLS[b & 0xF][1], SYMBOLS[b & 0xF][0])
+            for i, (a, b) in enumerate(zip(before, after)) if SYMBOLS[a & 0xF] != SYMBOLS[b & 0xF]]
@@ -0,0 +1,136 @@
+import base64
+import hashlib
+import json
+import os
+import tempfile
+import zlib
+from dataclasses import dataclass, field, replace
+from typing import Dict, Optional
+
+from garden.cache import LRUCache
+from garden.meter import ExecStats
+from garden.sandbox import GridDiff
+
+# Bump when validators or sandbox semantics change so persisted results are not reused.
+RESULT_CACHE_VERSION = "7"
+
+
+@dataclass
+class RunResult:
+    ok: bool
+    error: str
+    message: str
+    diff: GridDiff = field(default_factory=list)   # changes relative to step.setup
+    namespace: Dict[str, object] = field(default_factory=dict)
+    stats: Optional[ExecStats] = None   # set when the run was metered
+    output: str = ""                    # print() output, capped (see garden.sandbox.OutputBuffer)
+
+
+def result_key(level_id: str, step_digest: str, source: str) -> str:
+    # step_digest (Step.digest) changes whenever the step's grading does.
+    h = hashlib.sha256(f"{RESULT_CACHE_VERSION}\0{level_id}\0{step_digest}\0".encode("utf-8"))
+    h.update(source.encode("utf-8"))
+    return h.hexdigest()
+
+
+class _Zipped(bytes):
+    # zlib-compressed full-grid diff (big gardens compress to a few KB).
+    pass
+
+
+# On disk a result is zlib-compressed JSON, never pickle: the directory may
+# be shared, and loading a file must not run code. Namespace snapshots
+# (garden.sandbox.snapshot_namespace) hold scalars plus lists, tuples, sets
+# and dicts with any such keys, so containers are tagged.
+_CONTAINERS = {"l": list, "t": tuple, "s": set, "f": frozenset}
+
+def _encode_value(v):
+    if isinstance(v, dict):
+        return {"d": [[_encode_value(k), _encode_value(x)] for k, x in v.items()]}
+    for tag, kind in _CONTAINERS.items():
+        if type(v) is kind:
+            return {tag: [_encode_value(x) for x in v]}
+    return v
+
+def _decode_value(v):
+    if not isinstance(v, dict):
+        return v
+    (tag, items), = v.items()
+    if tag == "d":
+        return {_decode_value(k): _decode_value(x) for k, x in items}
+    return _CONTAINERS[tag](_decode_value(x) for x in items)
+
+def encode_result(res: RunResult) -> bytes:
+    d = dict(res.__dict__)
+    if isinstance(res.diff, (bytes, bytearray)):
+        zipped = res.diff if isinstance(res.diff, _Zipped) else zlib.compress(res.diff)
+        d["diff"] = {"zipped": base64.b64encode(zipped).decode("ascii")}
+    d["namespace"] = _encode_value(res.namespace)
+    d["stats"] = None if res.stats is None else res.stats.__dict__
+    return zlib.compress(json.dumps(d, ensure_ascii=False).encode("utf-8"))
+
+def decode_result(blob: bytes) -> RunResult:
+    # Raises ValueError (or zlib.error, KeyError, TypeError) on a malformed blob.
+    d = json.loads(zlib.decompress(blob))
+    diff = d["diff"]
+    d["diff"] = _Zipped(base64.b64decode(diff["zipped"])) if isinstance(diff, dict) else [tuple(p) for p in diff]
+    d["namespace"] = _decode_value(d["namespace"])
+    d["stats"] = None if d["stats"] is None else ExecStats(**d["stats"])
+    return RunResult(**d)
+
+
+class ResultCache:
+    """In-memory LRU of RunResults with optional on-disk persistence.
+
+    With ``directory`` set, results are also written as compressed JSON
+    (``<dir>/<key[:2]>/<key>.json.z``, see :func:`encode_result`) so they
+    survive restarts and can be shared by processes on the same host.
+    """
+
+    def __init__(self, maxsize: int = 4096, directory: Optional[str] = None,
+                 max_sparse_diff: int = 20_000):
+        self.memory: "LRUCache[RunResult]" = LRUCache(maxsize)
+        self.directory = directory
+        self.max_sparse_diff = max_sparse_diff
+        self.disk_hits = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + ".json.z")
+
+    def get(self, key: str) -> Optional[RunResult]:
+        res = self.memory.get(key)
+        if res is None and self.directory:
+            try:
+                with open(self._path(key), "rb") as f:
+                    res = decode_result(f.read())
+            except (OSError, ValueError, zlib.error, KeyError, TypeError, AttributeError):
+                return None
+            self.disk_hits += 1
+            self.memory.put(key, res)
+        if res is not None and isinstance(res.diff, _Zipped):
+            res = replace(res, diff=zlib.decompress(res.diff))
+        return res
+
+    def put(self, key: str, res: RunResult) -> None:
+        if isinstance(res.diff, (bytes, bytearray)):
+            res = replace(res, diff=_Zipped(zlib.compress(res.diff)))
+        elif len(res.diff) > self.max_sparse_diff:
+            return
+        self.memory.put(key, res)
+        if not self.directory:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(encode_result(res))
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.memory.stats(), "disk_hits": self.disk_hits}
+
+
+RESULT_CACHE = ResultCache(directory=os.environ.get("GARDEN_RESULT_CACHE_DIR") or None)
@@ -0,0 +1,150 @@
+"""Run and grade one submission: compile, gate, execute, validate.
+
+This is the path behind the Run button, without Streamlit, so the batch
+grader (:mod:`garden.grade`) and the UI share it. :func:`run` works on a
+learner's :class:`~garden.state.GardenState`; :func:`run_user_code` is the
+stateless core. Execution goes through
+a :class:`~garden.workers.SandboxPool` when one is given and falls back to
+metered in-process ``exec`` otherwise; outcomes are memoized in a
+:class:`~garden.results.ResultCache`.
+"""
+import threading
+from types import CodeType
+from typing import Callable, Optional, Tuple
+
+from garden import metrics
+from garden.analysis import Analysis
+from garden.codecache import compile_user_code
+from garden.grid import PackedGrid
+from garden.levels import Catalog, Level, Step
+from garden.meter import DEFAULT_STEP_BUDGET, BudgetExceeded, ExecStats, ExecutionMeter
+from garden.results import RESULT_CACHE, ResultCache, RunResult, result_key
+from garden.sandbox import (BUDGET_MESSAGE, CANCEL_MESSAGE, GridDiff, OutputBuffer, ProgressReporter, RunCancelled,
+                            apply_diff, exec_user_code, grid_diff, snapshot_namespace)
+from garden.state import GardenState
+from garden.workers import SandboxPool
+
+ERROR_MESSAGE = "There was an error in your code."
+COST_MESSAGE = ("Your loops are nested {depth} deep: on a {size}×{size} garden that is about {passes:,} passes, "
+                "more than this step's {budget:,}-line budget. Try fewer nested loops.")
+
+# on_progress(diff since the previous call, stats so far, output so far or
+# None if unchanged), called while code runs.
+ProgressFn = Callable[[GridDiff, ExecStats, Optional[str]], None]
+
+
+def _in_process_hook(grid: PackedGrid, output: OutputBuffer, on_progress: Optional[ProgressFn],
+                     cancel: Optional[threading.Event]) -> Optional[Callable[[ExecStats], None]]:
+    # ExecutionMeter hook for the in-process path: stop on cancel, else report.
+    if on_progress is None and cancel is None:
+        return None
+    report = ProgressReporter(grid, on_progress, output=output) if on_progress is not None else None
+
+    def hook(stats: ExecStats) -> None:
+        if cancel is not None and cancel.is_set():
+            raise RunCancelled()
+        if report is not None:
+            report(stats)
+    return hook
+
+
+def execute(code: CodeType, level: Level, step: Step, grid: PackedGrid,
+            pool: Optional[SandboxPool] = None, on_progress: Optional[ProgressFn] = None,
+            cancel: Optional[threading.Event] = None) -> Tuple[RunResult, bool]:
+    # Returns the result and whether it may be memoized.
+    budget = step.budget or DEFAULT_STEP_BUDGET
+    if pool is not None:
+        with metrics.span("exec"):
+            res = pool.run(code, grid, metered=True, budget=budget, reads=step.reads,
+                           on_progress=on_progress, cancel=cancel)
+        apply_diff(grid, res.diff)
+        if res.error:
+            return (RunResult(False, res.error, ERROR_MESSAGE, res.diff, stats=res.stats, output=res.output),
+                    not res.limited)
+        ns, stats, diff, output = res.namespace, res.stats, res.diff, res.output   # the worker already diffed
+    else:
+        before = bytes(grid.data)
+        buf = OutputBuffer()
+        meter = ExecutionMeter(budget, on_progress=_in_process_hook(grid, buf, on_progress, cancel))
+        try:
+            with metrics.span("exec"):
+                ns = snapshot_namespace(exec_user_code(code, grid, meter, buf), step.reads)
+        except RunCancelled:
+            return RunResult(False, CANCEL_MESSAGE, ERROR_MESSAGE, grid_diff(before, grid.data), stats=meter.stats,
+                             output=buf.getvalue()), False
+        except BudgetExceeded:
+            return RunResult(False, BUDGET_MESSAGE, ERROR_MESSAGE, grid_diff(before, grid.data), stats=meter.stats,
+                             output=buf.getvalue()), True
+        except BaseException as e:   # anything the learner raised, as in the sandbox worker
+            return RunResult(False, str(e) or type(e).__name__, ERROR_MESSAGE, grid_diff(before, grid.data),
+                             stats=meter.stats, output=buf.getvalue()), True
+        stats, diff, output = meter.stats, grid_diff(before, grid.data), buf.getvalue()
+    with metrics.span("validate"):
+        ok, message = step.validator(grid, level.size, ns)
+    return RunResult(ok, "", message, diff, ns, stats, output), True
+
+
+def too_costly(analysis: Analysis, level: Level, step: Step) -> str:
+    # Refuse before running when nested loops that each walk one side of the
+    # garden would already use up the line budget (big levels, in practice).
+    budget = step.budget or DEFAULT_STEP_BUDGET
+    passes = analysis.metrics.estimated_passes(level.size)
+    if analysis.metrics.max_loop_depth < 2 or passes <= budget:
+        return ""
+    return COST_MESSAGE.format(depth=analysis.metrics.max_loop_depth, size=level.size, passes=passes, budget=budget)
+
+
+def run_user_code(source: str, level: Level, step: Step, grid: Optional[PackedGrid] = None, *,
+                  pool: Optional[SandboxPool] = None,
+                  cache: Optional[ResultCache] = RESULT_CACHE,
+                  on_progress: Optional[ProgressFn] = None,
+                  cancel: Optional[threading.Event] = None) -> Tuple[RunResult, PackedGrid]:
+    """Grade ``source`` on a fresh ``step.setup`` grid (or ``grid``, already set up).
+
+    Returns the result (with the run's capped ``print`` output) and the grid
+    after the run. ``on_progress`` receives grid changes and output while
+    the code executes (not for cached replays), and
+    setting ``cancel`` stops the run with :data:`~garden.sandbox.CANCEL_MESSAGE`.
+    """
+    if grid is None:
+        with metrics.span("setup"):
+            grid = step.setup(level.size)
+
+    # Same (level, step, source) always gives the same outcome: replay it.
+    key = result_key(level.id, step.digest, source)
+    res = cache.get(key) if cache is not None else None
+    if res is not None:
+        apply_diff(grid, res.diff)
+        return res, grid
+
+    try:
+        with metrics.span("compile"):
+            compiled = compile_user_code(source)
+        cost = too_costly(compiled.analysis, level, step)
+        if compiled.analysis.violation:
+            res, cacheable = RunResult(False, "", compiled.analysis.violation), True
+        elif cost:
+            res, cacheable = RunResult(False, cost, ERROR_MESSAGE), True
+        else:
+            res, cacheable = execute(compiled.code, level, step, grid, pool, on_progress, cancel)
+    except Exception as e:
+        res, cacheable = RunResult(False, str(e), ERROR_MESSAGE), isinstance(e, SyntaxError)
+    if cacheable and cache is not None:
+        cache.put(key, res)
+    return res, grid
+
+
+def run(state: GardenState, catalog: Catalog, source: str, *, pool: Optional[SandboxPool] = None,
+        cache: Optional[ResultCache] = RESULT_CACHE) -> RunResult:
+    """Run ``source`` for the learner's current step and update ``state``.
+
+    Saves the draft, replaces the grid with the post-run grid (recording it
+    in the step's run history) and, when the run got far enough to
+    validate, keeps its namespace snapshot.
+    """
+    state.sync(catalog)
+    level, step = state.level(catalog), state.step(catalog)
+    state.drafts.put(state.editor_key, source, step.starter)
+    res, grid = run_user_code(source, level, step, pool=pool, cache=cache)
+    state.apply_run(res, grid, source)
+    return res
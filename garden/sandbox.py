@@ -0,0 +1,303 @@
+import builtins as _bi
+import itertools
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Callable, Deque, Dict, Iterable, List, Optional, Tuple, Union
+
+from garden.analysis import is_blocked_attribute
+from garden.grid import PackedGrid, PLANT_BIT, WATERED_BIT, FERTILIZED_BIT, REMOVED_BIT
+from garden.render import VIEWPORT_THRESHOLD
+
+if TYPE_CHECKING:
+    from garden.meter import ExecStats
+
+# ==========================
+# Sandbox API
+# ==========================
+
+def grid_api_factory(grid: PackedGrid) -> Tuple[Callable, Callable, Callable, Callable]:
+    # Bind the flag bytes once: every call flips a bit in place instead of
+    # looking the grid up again and allocating a replacement Tile.
+    data = grid.data
+    n = len(data)
+
+    def water(i:int):
+        if 0 <= i < n:
+            data[i] |= WATERED_BIT
+    def fertilize(i:int):
+        if 0 <= i < n:
+            data[i] |= FERTILIZED_BIT
+    def remove(i:int):
+        if 0 <= i < n:
+            data[i] |= REMOVED_BIT
+    def get(i:int) -> Dict[str, bool]:
+        if 0 <= i < n:
+            b = data[i]
+            return {"plant": bool(b & PLANT_BIT), "watered": bool(b & WATERED_BIT),
+                    "fertilized": bool(b & FERTILIZED_BIT), "removed": bool(b & REMOVED_BIT)}
+        return {"plant": False, "watered": False, "fertilized": False, "removed": False}
+    return water, fertilize, remove, get
+
+def range_api_factory(grid: PackedGrid) -> Tuple[Callable, Callable, Callable]:
+    # Bulk versions for the big-garden levels: one call marks every index of
+    # range(start, stop, step) that lies on the grid, at C speed.
+    def water_range(start:int, stop:int, step:int = 1):
+        grid.set_flags(WATERED_BIT, start, stop, step)
+    def fertilize_range(start:int, stop:int, step:int = 1):
+        grid.set_flags(FERTILIZED_BIT, start, stop, step)
+    def remove_range(start:int, stop:int, step:int = 1):
+        grid.set_flags(REMOVED_BIT, start, stop, step)
+    return water_range, fertilize_range, remove_range
+
+# ==========================
+# Builtins
+# ==========================
+_ALLOWED_BUILTINS = (
+    "ArithmeticError","AssertionError","AttributeError","BaseException","Exception","False","True","None",
+    "abs","all","any","bool","bytes","callable","chr","complex","dict","dir","divmod","enumerate",
+    "filter","float","format","frozenset","getattr","hasattr","hash","hex","id","int","isinstance",
+    "issubclass","iter","len","list","map","max","min","next","object","oct","ord","pow","print","range",
+    "repr","reversed","round","set","slice","sorted","str","sum","tuple","type","zip"
+)
+SAFE_BUILTINS = {k: getattr(_bi, k) for k in _ALLOWED_BUILTINS if hasattr(_bi, k)}
+
+def _blocked(*a, **k):
+    raise RuntimeError("Not allowed in this sandbox")
+for bad in ("__import__","open","exec","eval","compile","globals","locals","__build_class__","input"):
+    SAFE_BUILTINS[bad] = _blocked
+
+# getattr/hasattr by name: the AST gate only sees names spelled out as
+# constants, so names built at runtime are checked here, against the same
+# rule. A str subclass (type() can build one) is copied to a plain str
+# first, so its own __eq__ or __hash__ cannot get past the check.
+def _check_name(name):
+    if isinstance(name, str):
+        name = str.__str__(name)
+        if is_blocked_attribute(name):
+            raise AttributeError(f"Access to '{name}' is disabled in this sandbox")
+    return name
+
+def _safe_getattr(obj, name, *default):
+    return getattr(obj, _check_name(name), *default)
+
+def _safe_hasattr(obj, name):
+    return hasattr(obj, _check_name(name))
+
+SAFE_BUILTINS["getattr"] = _safe_getattr
+SAFE_BUILTINS["hasattr"] = _safe_hasattr
+
+# ==========================
+# Output
+# ==========================
+
+# Bytes of print() output kept per run; older output is dropped first.
+OUTPUT_MAX_BYTES = 8 * 1024
+
+
+class OutputBuffer:
+    """Ring buffer that stands in for ``print`` in learner code.
+
+    Keeps the last ``max_bytes`` of output; when earlier output has been
+    dropped, :meth:`getvalue` starts with a marker saying how much.
+    """
+
+    def __init__(self, max_bytes: int = OUTPUT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._chunks: Deque[Tuple[str, int]] = deque()   # (text, UTF-8 size)
+        self.nbytes = 0
+        self.total = 0   # bytes ever written, kept or not
+
+    def write(self, text: str) -> None:
+        n = len(text.encode("utf-8"))
+        self.total += n
+        if n > self.max_bytes:
+            # Keep the tail of an oversized write; it replaces everything else.
+            text = text.encode("utf-8")[-self.max_bytes:].decode("utf-8", "ignore")
+            n = len(text.encode("utf-8"))
+            self._chunks.clear()
+            self.nbytes = 0
+        self._chunks.append((text, n))
+        self.nbytes += n
+        while self.nbytes > self.max_bytes:
+            self.nbytes -= self._chunks.popleft()[1]
+
+    def print(self, *args, sep: Optional[str] = " ", end: Optional[str] = "\n", file=None, flush: bool = False) -> None:
+        # Same signature as the builtin; `file` and `flush` are ignored.
+        self.write((" " if sep is None else sep).join(map(str, args)) + ("\n" if end is None else end))
+
+    @property
+    def dropped(self) -> int:
+        return self.total - self.nbytes
+
+    def getvalue(self) -> str:
+        text = "".join(t for t, _ in self._chunks)
+        if self.dropped:
+            return f"... [{self.dropped:,} bytes of earlier output dropped] ...\n" + text
+        return text
+
+# ==========================
+# Execution
+# ==========================
+
+BUDGET_MESSAGE = "Step budget exceeded: your code ran too many lines. Try a shorter loop."
+CANCEL_MESSAGE = "Run cancelled."
+
+
+class SandboxAbort(BaseException):
+    # Stops learner code from outside it (budget, CPU limit, cancel). It
+    # derives from BaseException so a learner's `except Exception:` cannot
+    # swallow it.
+    pass
+
+class BudgetExceeded(SandboxAbort):
+    # Raised by garden.meter.ExecutionMeter when the line budget runs out.
+    pass
+
+class RunCancelled(SandboxAbort):
+    # Raised from a progress hook to stop an in-process run.
+    pass
+
+def exec_user_code(user_code, grid: PackedGrid, meter=None, output: Optional[OutputBuffer] = None) -> Dict[str, object]:
+    # Runs learner code against `grid` (mutated in place) and returns the
+    # learner's top-level variables. Exceptions propagate to the caller;
+    # with an ExecutionMeter, exceeding its budget raises BudgetExceeded.
+    # print() writes to `output` (a throwaway buffer if None), never stdout.
+    water, fertilize, remove, get = grid_api_factory(grid)
+    if output is None:
+        output = OutputBuffer()
+    g = {"__builtins__": {**SAFE_BUILTINS, "print": output.print},
+         "water": water, "fertilize": fertilize, "remove": remove, "get": get, "N": grid.size}
+    if grid.size > VIEWPORT_THRESHOLD:
+        # Only the big gardens get the bulk calls; the small levels teach the loop they replace.
+        water_range, fertilize_range, remove_range = range_api_factory(grid)
+        g.update(water_range=water_range, fertilize_range=fertilize_range, remove_range=remove_range)
+    loc: Dict[str, object] = {}
+    if meter is None:
+        exec(user_code, g, loc)
+    else:
+        with meter:
+            exec(user_code, g, loc)
+        if meter.stats.exceeded:
+            # The learner caught BudgetExceeded with a bare except.
+            raise BudgetExceeded()
+    return loc
+
+_PLAIN_SCALARS = (bool, int, float, str, type(None))
+
+# Caps applied to every snapshotted value so a learner's million-element
+# list costs a few KB in session state, not the whole list.
+SNAPSHOT_MAX_ITEMS = 50     # elements kept per list/tuple/set/dict
+SNAPSHOT_MAX_STR = 500      # characters kept per string
+SNAPSHOT_MAX_DEPTH = 3
+
+_DROP = object()
+
+def _compact(v, depth: int = 0):
+    # Plain data capped to the limits above; _DROP for anything else.
+    if isinstance(v, str):
+        return v[:SNAPSHOT_MAX_STR]
+    if isinstance(v, _PLAIN_SCALARS):
+        return v
+    if depth >= SNAPSHOT_MAX_DEPTH:
+        return _DROP
+    if isinstance(v, (list, tuple, set, frozenset)):
+        items = [_compact(x, depth + 1) for x in itertools.islice(v, SNAPSHOT_MAX_ITEMS)]
+        if any(x is _DROP for x in items):
+            return _DROP
+        return items if isinstance(v, list) else tuple(items) if isinstance(v, tuple) else type(v)(items)
+    if isinstance(v, dict):
+        out = {}
+        for k, x in itertools.islice(v.items(), SNAPSHOT_MAX_ITEMS):
+            k, x = _compact(k, depth + 1), _compact(x, depth + 1)
+            if k is _DROP or x is _DROP:
+                return _DROP
+            out[k] = x
+        return out
+    return _DROP
+
+def snapshot_namespace(ns: Dict[str, object], names: Optional[Iterable[str]] = None) -> Dict[str, object]:
+    # Keep only plain data (no functions, modules or API closures) so the
+    # snapshot can cross a process boundary and sit in session state. With
+    # `names`, only those variables are kept: the ones the step reads.
+    keys = [k for k in names if k in ns] if names is not None else [k for k in ns if not k.startswith("__")]
+    out = {}
+    for k in keys:
+        v = _compact(ns[k])
+        if v is not _DROP:
+            out[k] = v
+    return out
+
+# Either sparse (index, new byte) pairs or, when most tiles changed, the
+# full new byte string.
+GridDiff = Union[List[Tuple[int, int]], bytes]
+
+_NONZERO = bytes([0]) + bytes([1]) * 255
+_DIFF_BLOCK = 4096
+
+def grid_diff(before: bytes, after: bytes) -> GridDiff:
+    if before == after:
+        return []
+    n = len(after)
+    limit = n // 8
+    # Unchanged blocks are skipped with a memcmp. Changed ones are XORed
+    # as big ints to mark changed bytes without a Python-level loop over
+    # tiles, and counting stops as soon as the full bytes are cheaper.
+    blocks: List[Tuple[int, bytes, bytes]] = []
+    total = 0
+    for start in range(0, n, _DIFF_BLOCK):
+        a, b = after[start:start + _DIFF_BLOCK], before[start:start + _DIFF_BLOCK]
+        if a == b:
+            continue
+        changed = (int.from_bytes(b, "big") ^ int.from_bytes(a, "big")).to_bytes(len(a), "big").translate(_NONZERO)
+        total += changed.count(1)
+        if total > limit:
+            return bytes(after)
+        blocks.append((start, a, changed))
+    out: List[Tuple[int, int]] = []
+    for start, a, changed in blocks:
+        i = changed.find(1)
+        while i != -1:
+            out.append((start + i, a[i]))
+            i = changed.find(1, i + 1)
+    return out
+
+def apply_diff(grid: PackedGrid, diff: GridDiff) -> None:
+    data = grid.data
+    if isinstance(diff, (bytes, bytearray)):
+        data[:] = diff
+        return
+    for i, b in diff:
+        data[i] = b
+
+
+class ProgressReporter:
+    """ExecutionMeter hook that streams grid changes and output while code runs.
+
+    Each call (every thousand lines of learner code) sends the diff since
+    the previous report, at most once per ``interval`` seconds, through
+    ``send(diff, stats, output)``; ``output`` is the buffer's current text,
+    or None when nothing was printed since the last report.
+    """
+
+    def __init__(self, grid: PackedGrid, send: Callable[[GridDiff, "ExecStats", Optional[str]], None],
+                 interval: float = 0.1, output: Optional[OutputBuffer] = None):
+        self.grid = grid
+        self.send = send
+        self.interval = interval
+        self.output = output
+        self._sent = bytes(grid.data)
+        self._sent_total = 0
+        self._last = time.monotonic()
+
+    def __call__(self, stats: "ExecStats") -> None:
+        now = time.monotonic()
+        if now - self._last < self.interval:
+            return
+        self._last = now
+        diff = grid_diff(self._sent, self.grid.data)
+        if diff:
+            self._sent = bytes(self.grid.data)
+        text = None
+        if self.output is not None and self.output.total != self._sent_total:
+            text, self._sent_total = self.output.getvalue(), self.output.total
+        self.send(diff, stats, text)
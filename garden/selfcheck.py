@@ -0,0 +1,163 @@
+"""Self-check of the reference solutions, and what each one costs.
+
+    python -m garden.selfcheck                    # every step, through the sandbox
+    python -m garden.selfcheck -o costs.json --workers 8
+
+Every step's ``solution`` runs through :func:`garden.runner.run_user_code`
+(uncached, on a fresh setup), one thread per sandbox worker, and must pass
+the step's validator. The report gives each solution's wall time, traced
+lines and calls (grid API and learner functions), and the share of the
+step's line budget it uses. A step without a solution, a failing solution
+or one using more than ``BUDGET_SHARE`` of its budget exits 1.
+
+:func:`warm_references` makes the same measurement in-process, on a
+background thread, for each catalog the app loads; :func:`reference_cost`
+looks a step's result up and :func:`compare_cost` tells the page when a
+learner's passing run was much costlier than it.
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import List, Optional, Tuple
+
+from garden import metrics, workers
+from garden.cache import LRUCache
+from garden.content import get_catalog
+from garden.levels import Catalog, Level, Step
+from garden.meter import DEFAULT_STEP_BUDGET, ExecStats
+from garden.runner import run_user_code
+from garden.workers import SandboxPool
+
+# A solution may use at most this share of its step's line budget, so a
+# correct learner approach a few times costlier still fits.
+BUDGET_SHARE = 0.5
+
+# compare_cost flags runs at least COST_FACTOR times the reference and at
+# least COST_SLACK lines or calls over it (so one extra line on a one-line
+# step is not news).
+COST_FACTOR = 2.0
+COST_SLACK = 10
+
+
+@dataclass
+class Reference:
+    ok: bool
+    error: str
+    ms: float
+    lines: int
+    calls: int
+    budget: int
+
+
+def measure(level: Level, step: Step, pool: Optional[SandboxPool] = None) -> Reference:
+    budget = step.budget or DEFAULT_STEP_BUDGET
+    if not step.solution:
+        return Reference(False, "no solution", 0.0, 0, 0, budget)
+    t0 = time.perf_counter()
+    res, _ = run_user_code(step.solution, level, step, pool=pool, cache=None)
+    ms = 1000 * (time.perf_counter() - t0)
+    stats = res.stats or ExecStats()
+    error = res.error or ("" if res.ok else f"validator: {res.message}")
+    if not error and stats.lines > BUDGET_SHARE * budget:
+        error = f"uses {stats.lines:,} of its {budget:,}-line budget"
+    return Reference(not error, error, ms, stats.lines, stats.calls, budget)
+
+
+def check_catalog(catalog: Catalog, pool: Optional[SandboxPool] = None,
+                  threads: Optional[int] = None) -> List[Tuple[str, Reference]]:
+    """Measure every step's solution in parallel; (``L<id>-S<index>``, result) in catalog order."""
+    todo = [(f"L{lvl.id}-S{i}", lvl, step) for lvl in catalog.levels for i, step in enumerate(lvl.steps)]
+    with ThreadPoolExecutor(threads or (pool.size if pool is not None else 1)) as ex:
+        refs = list(ex.map(lambda t: measure(t[1], t[2], pool), todo))
+    return [(name, ref) for (name, _, _), ref in zip(todo, refs)]
+
+
+# (level id, step digest, solution) -> Reference; a content edit misses.
+_REFERENCES: "LRUCache[Reference]" = LRUCache(maxsize=256)
+
+def _reference_key(level: Level, step: Step) -> Tuple[str, str, str]:
+    return (level.id, step.digest, step.solution)
+
+def measure_references(catalog: Catalog) -> int:
+    """Measure, in-process, every solution not measured yet; returns how many were."""
+    n = 0
+    with metrics.muted():   # not learner runs: kept out of the stage timings
+        for lvl in catalog.levels:
+            for step in lvl.steps:
+                key = _reference_key(lvl, step)
+                if step.solution and key not in _REFERENCES:
+                    _REFERENCES.put(key, measure(lvl, step))
+                    n += 1
+    return n
+
+
+_warmed: "weakref.WeakSet[Catalog]" = weakref.WeakSet()
+_warm_lock = threading.Lock()
+
+def warm_references(catalog: Catalog) -> None:
+    # measure_references on a daemon thread, once per catalog object.
+    with _warm_lock:
+        if catalog in _warmed:
+            return
+        _warmed.add(catalog)
+    threading.Thread(target=measure_references, args=(catalog,), name="garden-references", daemon=True).start()
+
+def reference_cost(level: Level, step: Step) -> Optional[Reference]:
+    # None until warm_references has measured the step, or when it has no passing solution.
+    if not step.solution:
+        return None
+    ref = _REFERENCES.get(_reference_key(level, step))
+    return ref if ref is not None and ref.ok else None
+
+
+def compare_cost(stats: ExecStats, ref: Reference) -> Optional[Tuple[str, float]]:
+    """``("calls" | "lines", ratio)`` when ``stats`` is well over the reference, else None.
+
+    Calls are compared when the reference makes any, lines otherwise.
+    """
+    unit, mine, theirs = ("calls", stats.calls, ref.calls) if ref.calls else ("lines", stats.lines, ref.lines)
+    if mine - theirs < COST_SLACK or mine < COST_FACTOR * max(1, theirs):
+        return None
+    return unit, mine / max(1, theirs)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m garden.selfcheck", description=__doc__.splitlines()[0])
+    ap.add_argument("-o", "--output", default=None, help="write the costs as JSON")
+    ap.add_argument("--workers", type=int, default=None, help="sandbox workers (default: as the app)")
+    ap.add_argument("--content-dir", default=None, help="level files (default: content/levels)")
+    ap.add_argument("--no-sandbox", action="store_true", help="run the solutions in-process")
+    args = ap.parse_args(argv)
+
+    catalog = get_catalog(args.content_dir)
+    pool = SandboxPool(args.workers) if not args.no_sandbox and workers.available() else None
+    start = time.perf_counter()
+    try:
+        results = check_catalog(catalog, pool, args.workers if pool is None else None)
+    finally:
+        if pool is not None:
+            pool.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"{'step':<8} {'ms':>8} {'lines':>9} {'calls':>9} {'% budget':>9}  result")
+    for name, ref in results:
+        share = f"{ref.lines / ref.budget:.1%}"
+        print(f"{name:<8} {ref.ms:>8.1f} {ref.lines:>9,} {ref.calls:>9,} {share:>9}  {'ok' if ref.ok else ref.error}")
+    failed = sum(not ref.ok for _, ref in results)
+    print(f"{len(results)} solutions in {elapsed:.1f}s "
+          f"({'sandbox x' + str(pool.size) if pool is not None else 'in-process'}): {failed} failed",
+          file=sys.stderr)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({name: asdict(ref) for name, ref in results}, f, indent=2)
+            f.write("\n")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""Per-learner engine state, independent of any front-end.
+
+A :class:`GardenState` is everything the engine needs to know about one
+learner: where they are in the catalog, their grid, their drafts, the
+snapshot of their last run and, per step, the history of their runs
+(:mod:`garden.history`). The Streamlit page keeps one in
+``st.session_state``; the batch grader and load tests build their own.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from garden import metrics
+from garden.drafts import DraftStore
+from garden.grid import PackedGrid
+from garden.history import RunHistory
+from garden.levels import Catalog, Level, Step
+from garden.render import grid_fingerprint
+from garden.results import RunResult
+from garden.store import ProgressRecord
+
+
+def grid_key(level_idx: int, step_idx: int, step: Step) -> str:
+    # Identifies the setup a grid was built from; changes when the step's grading does.
+    return f"L{level_idx}-S{step_idx}-{step.digest}"
+
+
+@dataclass
+class GardenState:
+    level_idx: int = 0
+    step_idx: int = 0
+    grid: Optional[PackedGrid] = None
+    grid_key: str = ""                                           # setup the grid belongs to
+    drafts: DraftStore = field(default_factory=DraftStore)
+    last_ns: Dict[str, object] = field(default_factory=dict)    # compact snapshot of the last run
+    history: Dict[str, RunHistory] = field(default_factory=dict)  # grid_key -> runs on that setup
+    compacted: bool = False                                      # see compact()
+
+    def level(self, catalog: Catalog) -> Level:
+        return catalog.levels[self.level_idx]
+
+    def step(self, catalog: Catalog) -> Step:
+        return catalog.get_step(self.level_idx, self.step_idx)
+
+    @property
+    def editor_key(self) -> str:
+        return f"code_L{self.level_idx}_S{self.step_idx}"
+
+    def draft(self, catalog: Catalog) -> str:
+        return self.drafts.get(self.editor_key, self.step(catalog).starter)
+
+    def sync(self, catalog: Catalog) -> bool:
+        """Clamp the position to ``catalog`` and set up the step's grid if needed.
+
+        Returns True when the grid was (re)built, i.e. on a step change, the
+        first call, or a content reload that changed the step's grading.
+        """
+        self.level_idx = min(max(self.level_idx, 0), len(catalog.levels) - 1)
+        self.step_idx = min(max(self.step_idx, 0), len(catalog.levels[self.level_idx].steps) - 1)
+        step = self.step(catalog)
+        key = grid_key(self.level_idx, self.step_idx, step)
+        if self.grid is not None and self.grid_key == key:
+            return False
+        with metrics.span("setup"):
+            self.grid = step.setup(self.level(catalog).size)
+        self.grid_key = key
+        self.last_ns = {}
+        # Runs against an older version of this step's grading no longer apply.
+        prefix = f"L{self.level_idx}-S{self.step_idx}-"
+        for stale in [k for k in self.history if k.startswith(prefix) and k != key]:
+            del self.history[stale]
+        if key in self.history:
+            self.history[key].pos = -1
+        return True
+
+    def goto(self, catalog: Catalog, level_idx: int, step_idx: int = 0) -> None:
+        self.level_idx, self.step_idx = level_idx, step_idx
+        self.sync(catalog)
+
+    def reset(self, catalog: Catalog) -> None:
+        # Fresh grid and the starter back in the editor for the current step.
+        # The run history stays; it just points at the setup again.
+        step = self.step(catalog)
+        with metrics.span("setup"):
+            self.grid = step.setup(self.level(catalog).size)
+        self.last_ns = {}
+        self.drafts.put(self.editor_key, step.starter, step.starter)
+        if self.grid_key in self.history:
+            self.history[self.grid_key].pos = -1
+
+    def apply_run(self, res: RunResult, grid: PackedGrid, source: str = "") -> None:
+        # The post-run grid replaces the current one and is added to the
+        # step's history; the snapshot is kept only when the run got far
+        # enough to validate.
+        before = bytes(self.grid.data) if self.grid is not None else b""
+        self.grid = grid
+        if not res.error:
+            self.last_ns = res.namespace
+        self.run_history().record(before, grid, res.diff, source, res.ok, self.last_ns)
+
+    def run_history(self) -> RunHistory:
+        # Runs on the current step's setup.
+        hist = self.history.get(self.grid_key)
+        if hist is None:
+            hist = self.history[self.grid_key] = RunHistory(self.grid_key)
+        return hist
+
+    def travel(self, catalog: Catalog, offset: int) -> bool:
+        """Show the run ``offset`` entries away in the step's history (-1 undo, +1 redo).
+
+        Returns False, changing nothing, when there is no such entry.
+        """
+        hist = self.run_history()
+        pos = hist.pos + offset
+        if not -1 <= pos < len(hist.entries):
+            return False
+        with metrics.span("setup"):
+            grid = self.step(catalog).setup(self.level(catalog).size)
+        self.grid = hist.restore(pos, grid)
+        self.last_ns = hist.current.namespace if hist.current is not None else {}
+        return True
+
+    def compact(self) -> None:
+        # Drop the grid, drafts, snapshot and run history of an idle session
+        # (garden.store.SessionStore.evict_idle); the front-end then reloads
+        # it with from_record. The run history is not persisted and is lost.
+        self.grid = None
+        self.last_ns = {}
+        self.history = {}
+        self.drafts = DraftStore()
+        self.compacted = True
+
+    def signature(self) -> Tuple:
+        # Cheap "did anything worth persisting change" key.
+        return (self.level_idx, self.step_idx, self.grid_key,
+                grid_fingerprint(self.grid) if self.grid is not None else "",
+                id(self.drafts), self.drafts.version)
+
+    def to_record(self) -> ProgressRecord:
+        return ProgressRecord(
+            level_idx=self.level_idx, step_idx=self.step_idx, drafts=self.drafts.export(),
+            grid=bytes(self.grid.data) if self.grid is not None else None,
+            grid_size=self.grid.size if self.grid is not None else 0, grid_key=self.grid_key)
+
+    @classmethod
+    def from_record(cls, rec: ProgressRecord) -> "GardenState":
+        grid = PackedGrid(rec.grid_size, bytearray(rec.grid)) if rec.grid is not None else None
+        return cls(level_idx=rec.level_idx, step_idx=rec.step_idx, grid=grid,
+                   grid_key=rec.grid_key, drafts=DraftStore.from_dict(rec.drafts))
@@ -0,0 +1,278 @@
+# Server-side learner progress, written behind to a SQLite or file backend so
+# any replica can restore a session. Idle sessions are evicted after a TTL.
+import atexit
+import base64
+import json
+import logging
+import os
+import re
+import secrets
+import tempfile
+import threading
+import time
+import weakref
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class ProgressRecord:
+    level_idx: int = 0
+    step_idx: int = 0
+    drafts: Dict[str, str] = field(default_factory=dict)   # editor key -> learner source
+    grid: Optional[bytes] = None   # PackedGrid.data for grid_key
+    grid_size: int = 0
+    grid_key: str = ""             # GardenState.grid_key the grid was set up for
+    updated: float = 0.0
+
+
+def encode_record(rec: ProgressRecord) -> bytes:
+    d = dict(rec.__dict__)
+    if rec.grid is not None:
+        d["grid"] = base64.b64encode(zlib.compress(rec.grid)).decode("ascii")
+    return zlib.compress(json.dumps(d, ensure_ascii=False).encode("utf-8"))
+
+def decode_record(blob: bytes) -> ProgressRecord:
+    d = json.loads(zlib.decompress(blob))
+    if d.get("grid") is not None:
+        d["grid"] = zlib.decompress(base64.b64decode(d["grid"]))
+    return ProgressRecord(**d)
+
+
+_SESSION_ID = re.compile(r"[A-Za-z0-9_-]{16,64}")
+
+def new_session_id() -> str:
+    return secrets.token_urlsafe(16)
+
+def valid_session_id(sid: object) -> bool:
+    # Session ids come from the URL; they also name files in FileBackend.
+    return isinstance(sid, str) and _SESSION_ID.fullmatch(sid) is not None
+
+# ==========================
+# Backends
+# ==========================
+
+Row = Tuple[str, float, bytes]   # (session id, updated, encoded record)
+
+class SQLiteBackend:
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        import sqlite3   # only the sqlite backend pays for it
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS progress ("
+            " session_id TEXT PRIMARY KEY, updated REAL NOT NULL, record BLOB NOT NULL)")
+
+    def read(self, sid: str) -> Optional[Tuple[float, bytes]]:
+        with self._lock:
+            row = self._db.execute("SELECT updated, record FROM progress WHERE session_id = ?", (sid,)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def write_many(self, rows: List[Row]) -> None:
+        # Newest write wins, even when two replicas flush the same session.
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany(
+                    "INSERT INTO progress (session_id, updated, record) VALUES (?, ?, ?)"
+                    " ON CONFLICT(session_id) DO UPDATE SET updated = excluded.updated, record = excluded.record"
+                    " WHERE excluded.updated >= progress.updated", rows)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class FileBackend:
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, sid: str) -> str:
+        return os.path.join(self.directory, sid[:2], sid + ".rec")
+
+    def read(self, sid: str) -> Optional[Tuple[float, bytes]]:
+        try:
+            with open(self._path(sid), "rb") as f:
+                return os.fstat(f.fileno()).st_mtime, f.read()
+        except OSError:
+            return None
+
+    def write_many(self, rows: List[Row]) -> None:
+        for sid, updated, blob in rows:
+            path = self._path(sid)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(blob)
+            os.utime(tmp, (updated, updated))
+            os.replace(tmp, path)
+
+    def close(self) -> None:
+        pass
+
+# ==========================
+# Store
+# ==========================
+
+class SessionStore:
+    def __init__(self, backend, ttl: float = 1800.0, flush_interval: float = 1.0, batch_size: int = 64):
+        self.backend = backend
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._hot: Dict[str, Tuple[ProgressRecord, float]] = {}   # sid -> (record, last access)
+        self._pending: Dict[str, ProgressRecord] = {}
+        self._inflight: Dict[str, ProgressRecord] = {}   # batch being written right now
+        self._attached: Dict[str, Tuple[weakref.ref, float]] = {}   # sid -> (session state, last seen)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self.writes = 0
+        self.batches = 0
+        self.evictions = 0
+        self._thread = threading.Thread(target=self._run, name="garden-session-store", daemon=True)
+        self._thread.start()
+
+    def get(self, sid: str, refresh: bool = False) -> Optional[ProgressRecord]:
+        """Latest record for ``sid``.
+
+        ``refresh`` skips the in-memory copy (but not unflushed writes); use
+        it when a session (re)connects, since another replica may have
+        written the session since this process last saw it.
+        """
+        now = time.time()
+        with self._lock:
+            rec = self._pending.get(sid) or self._inflight.get(sid)
+            if rec is None and not refresh and sid in self._hot:
+                rec = self._hot[sid][0]
+            if rec is not None:
+                self._hot[sid] = (rec, now)
+                return rec
+        row = self.backend.read(sid)
+        if row is None:
+            return None
+        try:
+            rec = decode_record(row[1])
+        except (ValueError, TypeError, zlib.error):
+            log.warning("discarding unreadable progress record for session %s", sid)
+            return None
+        with self._lock:
+            if sid not in self._pending:
+                self._hot[sid] = (rec, now)
+        return rec
+
+    def put(self, sid: str, rec: ProgressRecord) -> None:
+        rec.updated = time.time()
+        with self._lock:
+            self._hot[sid] = (rec, rec.updated)
+            self._pending[sid] = rec
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def flush(self) -> None:
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            self._inflight = batch
+        if not batch:
+            return
+        rows = [(sid, rec.updated, encode_record(rec)) for sid, rec in batch.items()]
+        try:
+            self.backend.write_many(rows)
+        except Exception:
+            log.exception("session store write failed; will retry %d record(s)", len(rows))
+            with self._lock:
+                for sid, rec in batch.items():
+                    self._pending.setdefault(sid, rec)   # keep newer puts made meanwhile
+            return
+        finally:
+            with self._lock:
+                self._inflight = {}
+        self.writes += len(rows)
+        self.batches += 1
+
+    def attach(self, sid: str, session_state: object) -> None:
+        # Mark the front-end's state for `sid` as in use; called on every
+        # interaction. Held weakly, so a closed session is not kept alive.
+        with self._lock:
+            self._attached[sid] = (weakref.ref(session_state), time.time())
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        # Drop idle records and compact idle attached states whose latest
+        # record is already in the backend; returns how many sessions.
+        cutoff = (now or time.time()) - self.ttl
+        with self._lock:
+            idle = [sid for sid, (_, seen) in self._hot.items() if seen < cutoff
+                    and sid not in self._pending and sid not in self._inflight]
+            for sid in idle:
+                del self._hot[sid]
+            stale = [sid for sid, (_, seen) in self._attached.items() if seen < cutoff
+                     and sid not in self._pending and sid not in self._inflight]
+            states = [self._attached.pop(sid)[0]() for sid in stale]
+        for state in states:
+            if state is not None:
+                state.compact()
+        evicted = len(set(idle) | set(stale))
+        self.evictions += evicted
+        return evicted
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+            self.evict_idle()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+        self.flush()
+        self.backend.close()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            hot, pending, attached = len(self._hot), len(self._pending), len(self._attached)
+        return {"hot": hot, "pending": pending, "attached": attached, "writes": self.writes,
+                "batches": self.batches, "evictions": self.evictions}
+
+
+def open_store(spec: str, **kwargs) -> SessionStore:
+    # "sqlite:<path>" or "file:<directory>"
+    kind, _, target = spec.partition(":")
+    if kind == "sqlite" and target:
+        return SessionStore(SQLiteBackend(target), **kwargs)
+    if kind == "file" and target:
+        return SessionStore(FileBackend(target), **kwargs)
+    raise ValueError(f"unknown session store {spec!r}; expected 'sqlite:<path>' or 'file:<directory>'")
+
+
+_default_store: Optional[SessionStore] = None
+_default_lock = threading.Lock()
+
+def default_store() -> Optional[SessionStore]:
+    # Process-wide store from $GARDEN_SESSION_STORE; None keeps progress in
+    # Streamlit's session state only.
+    global _default_store
+    spec = os.environ.get("GARDEN_SESSION_STORE")
+    if not spec:
+        return None
+    with _default_lock:
+        if _default_store is None:
+            _default_store = open_store(spec, ttl=float(os.environ.get("GARDEN_SESSION_TTL", "1800")))
+            atexit.register(_default_store.close)
+        return _default_store
@@ -0,0 +1,72 @@
+"""Validator DSL over a NumPy view of the grid.
+
+Validators are ``(grid, N, ns) -> (ok, message)`` callables. Build them
+with :func:`expect` for grid predicates or :func:`expect_vars` for the
+learner's variables; the predicate is evaluated once and the message is
+picked from that single result::
+
+    expect(lambda g: (g.watered == (g.r % 2 == 0)).all(),
+           ok="Маш сайн!", fail="Зөвхөн тэгш мөрүүдийг услаарай.")
+"""
+from functools import cached_property
+from typing import TYPE_CHECKING, Any, Callable, Dict, Tuple
+
+from garden.grid import PackedGrid, PLANT_BIT, WATERED_BIT, FERTILIZED_BIT, REMOVED_BIT
+
+if TYPE_CHECKING:
+    import numpy as np
+
+Validator = Callable[[PackedGrid, int, Dict[str, object]], Tuple[bool, str]]
+
+
+class GridView:
+    """Read-only (N, N) boolean arrays over a PackedGrid, without copying the bytes.
+
+    ``r`` and ``c`` are broadcastable row/column index arrays, so patterns
+    such as ``(g.r + g.c) % 2 == 0`` or ``g.r == g.c`` stay vectorized.
+    """
+
+    def __init__(self, grid: PackedGrid):
+        # numpy is imported on the first validation, not at app start-up.
+        import numpy as np
+        self.N = grid.size
+        self.flags = np.frombuffer(grid.data, dtype=np.uint8).reshape(self.N, self.N)
+        self.r = np.arange(self.N)[:, None]
+        self.c = np.arange(self.N)[None, :]
+
+    @cached_property
+    def plant(self) -> "np.ndarray":
+        return (self.flags & PLANT_BIT) != 0
+
+    @cached_property
+    def watered(self) -> "np.ndarray":
+        return (self.flags & WATERED_BIT) != 0
+
+    @cached_property
+    def fertilized(self) -> "np.ndarray":
+        return (self.flags & FERTILIZED_BIT) != 0
+
+    @cached_property
+    def removed(self) -> "np.ndarray":
+        return (self.flags & REMOVED_BIT) != 0
+
+    def at(self, *indices: int) -> "np.ndarray":
+        # (N, N) mask that is True only at the given flat tile indices.
+        import numpy as np
+        mask = np.zeros(self.N * self.N, dtype=bool)
+        mask[list(indices)] = True
+        return mask.reshape(self.N, self.N)
+
+
+def expect(predicate: Callable[[GridView], Any], ok: str, fail: str) -> Validator:
+    def validator(grid: PackedGrid, N: int, ns: Dict[str, object]) -> Tuple[bool, str]:
+        passed = bool(predicate(GridView(grid)))
+        return passed, ok if passed else fail
+    return validator
+
+
+def expect_vars(predicate: Callable[[Dict[str, object]], Any], ok: str, fail: str) -> Validator:
+    def validator(grid: PackedGrid, N: int, ns: Dict[str, object]) -> Tuple[bool, str]:
+        passed = bool(predicate(ns))
+        return passed, ok if passed else fail
+    return validator
@@ -0,0 +1,294 @@
+"""Pre-started sandbox worker processes for learner code.
+
+Each worker is a long-lived process that executes one submission at a
+time under a CPU-time limit (``RLIMIT_CPU``), an address-space limit
+(``RLIMIT_AS``) and a wall-clock timeout enforced by the parent. A worker
+that times out or dies is killed and replaced, so a runaway ``while True:``
+only costs its own process. Results come back as a grid diff plus a plain
+namespace snapshot (see :func:`garden.sandbox.snapshot_namespace`). A run
+can ask for :class:`Progress` messages (grid changes so far) while it
+executes, and can be cancelled, which kills the worker like a timeout.
+
+The pool limits CPU and memory only; it does not isolate the filesystem
+or the network. Workers get a minimal environment, and can be started as
+another user (``Limits.user``) in another directory (``Limits.workdir``).
+Anything stronger, such as a container, is up to the deployment.
+"""
+import json
+import marshal
+import math
+import os
+import queue
+import signal
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from types import CodeType
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Sequence
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, callers fall back to in-process exec
+    resource = None
+
+if TYPE_CHECKING:
+    from multiprocessing.connection import Connection
+
+from garden.grid import PackedGrid
+from garden.meter import BudgetExceeded, ExecStats, ExecutionMeter
+from garden.sandbox import (BUDGET_MESSAGE, CANCEL_MESSAGE, GridDiff, OutputBuffer, ProgressReporter, SandboxAbort,
+                            exec_user_code, grid_diff, snapshot_namespace)
+
+# How often a waiting parent checks whether its run was cancelled.
+CANCEL_POLL_SECONDS = 0.05
+
+
+@dataclass
+class Limits:
+    cpu_seconds: float = 2.0
+    wall_seconds: float = 5.0
+    memory_bytes: int = 256 * 1024 * 1024
+    user: Optional[str] = None      # run workers as this user (name or uid); the server must be root
+    workdir: Optional[str] = None   # workers' working directory; the server's when None
+
+
+@dataclass
+class WorkerResult:
+    error: str = ""
+    limited: bool = False   # stopped by a CPU/memory/wall limit; depends on load, so not memoized
+    diff: GridDiff = field(default_factory=list)
+    namespace: Dict[str, object] = field(default_factory=dict)
+    stats: Optional[ExecStats] = None
+    output: str = ""
+
+
+@dataclass
+class Progress:
+    # Sent by the worker while a run executes: grid changes since the last
+    # one, and the print() output so far (None if unchanged).
+    diff: GridDiff
+    stats: ExecStats
+    output: Optional[str] = None
+
+
+class CpuLimitExceeded(SandboxAbort):
+    # Raised on SIGXCPU, when the worker's CPU-time limit runs out.
+    pass
+
+
+def available() -> bool:
+    return resource is not None
+
+# ==========================
+# Worker process
+# ==========================
+
+def _vm_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+def _on_sigxcpu(signum, frame):
+    raise CpuLimitExceeded()
+
+def _set_cpu_budget(seconds: float) -> None:
+    ru = resource.getrusage(resource.RUSAGE_SELF)
+    soft = math.ceil(ru.ru_utime + ru.ru_stime + seconds)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+def _worker_main(inp: "Connection", out: "Connection", limits: Limits) -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGXCPU, _on_sigxcpu)
+    if limits.memory_bytes:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (_vm_bytes() + limits.memory_bytes, hard))
+        except (ValueError, OSError):
+            pass
+
+    while True:
+        try:
+            job = inp.recv()
+        except EOFError:
+            return
+        code_blob, data, size, metered, budget, reads, progress = job
+        grid = PackedGrid(size, data)
+        output = OutputBuffer()
+        meter = None
+        if progress is not None:
+            reporter = ProgressReporter(grid, lambda *msg: out.send(Progress(*msg)), progress, output)
+            meter = ExecutionMeter(budget if metered else None, on_progress=reporter)
+        elif metered:
+            meter = ExecutionMeter(budget)
+        result = WorkerResult()
+        _set_cpu_budget(limits.cpu_seconds)
+        try:
+            ns = exec_user_code(marshal.loads(code_blob), grid, meter, output)
+            result.namespace = snapshot_namespace(ns, reads)
+        except BudgetExceeded:
+            result.error = BUDGET_MESSAGE
+        except CpuLimitExceeded:
+            result.error = "Time limit exceeded. Is there an infinite loop?"
+            result.limited = True
+        except MemoryError:
+            result.error = "Memory limit exceeded. Is a list growing too large?"
+            result.limited = True
+        except BaseException as e:   # SystemExit, KeyboardInterrupt... raised by the learner
+            result.error = str(e) or type(e).__name__
+        finally:
+            _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+            resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+        # Partial changes are kept on error, matching in-process exec.
+        result.diff = grid_diff(data, grid.data)
+        result.stats = meter.stats if meter else None
+        result.output = output.getvalue()
+        out.send(result)
+
+# ==========================
+# Pool
+# ==========================
+
+_PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The only variables a worker inherits; secrets such as GARDEN_ADMIN_TOKEN
+# stay in the server.
+_WORKER_ENV = ("PATH", "LANG")
+
+def _worker_env() -> Dict[str, str]:
+    env = {k: os.environ[k] for k in _WORKER_ENV if k in os.environ}
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (_PACKAGE_ROOT, os.environ.get("PYTHONPATH")) if p)
+    return env
+
+def _user_group(user) -> int:
+    # Primary group of `user`, so a dropped worker keeps none of the server's groups.
+    import pwd
+    return (pwd.getpwuid(user) if isinstance(user, int) else pwd.getpwnam(user)).pw_gid
+
+class _Worker:
+    # A fresh interpreter running `python -m garden.workers`; it never
+    # re-imports the host's __main__ (Streamlit), unlike multiprocessing spawn.
+    def __init__(self, limits: Limits):
+        from multiprocessing.connection import Connection   # not needed until the first worker starts
+        user = int(limits.user) if limits.user and limits.user.isdigit() else limits.user
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "garden.workers", json.dumps(limits.__dict__)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=_worker_env(), close_fds=True,
+            cwd=limits.workdir, user=user, group=None if user is None else _user_group(user),
+            extra_groups=None if user is None else [],
+        )
+        self.conn_out = Connection(os.dup(self.proc.stdin.fileno()), readable=False)
+        self.conn_in = Connection(os.dup(self.proc.stdout.fileno()), writable=False)
+        self.proc.stdin.close()
+        self.proc.stdout.close()
+
+    def kill(self) -> None:
+        self.proc.kill()
+        self.proc.wait()
+        self.conn_out.close()
+        self.conn_in.close()
+
+
+class SandboxPool:
+    def __init__(self, size: Optional[int] = None, limits: Optional[Limits] = None):
+        if not available():
+            raise RuntimeError("SandboxPool needs the POSIX 'resource' module")
+        self.limits = limits or Limits()
+        self.size = size or min(4, os.cpu_count() or 1)
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        for _ in range(self.size):
+            self._idle.put(_Worker(self.limits))
+
+    def run(self, code: CodeType, grid: PackedGrid, *, metered: bool = False,
+            budget: Optional[int] = None, reads: Optional[Sequence[str]] = None,
+            on_progress: Optional[Callable[[GridDiff, ExecStats, Optional[str]], None]] = None,
+            progress_interval: float = 0.1,
+            cancel: Optional[threading.Event] = None) -> WorkerResult:
+        # `reads` projects the namespace in the worker, so unread variables
+        # never cross the pipe. With `on_progress`, the worker reports grid
+        # changes and output at most every `progress_interval` seconds; setting `cancel`
+        # kills the worker and returns a (non-memoizable) cancelled result.
+        # Code objects are not picklable; marshal is far cheaper than recompiling.
+        # A worker goes back to the pool only after a clean result; any
+        # other way out of here replaces it.
+        job = (marshal.dumps(code), bytes(grid.data), grid.size, metered, budget,
+               None if reads is None else tuple(reads), progress_interval if on_progress is not None else None)
+        worker = self._idle.get()
+        clean = False
+        try:
+            try:
+                worker.conn_out.send(job)
+            except OSError:   # died while idle (BrokenPipeError), or killed by a failed respawn
+                worker.kill()
+                worker = _Worker(self.limits)
+                worker.conn_out.send(job)
+            deadline = time.monotonic() + self.limits.wall_seconds
+            while True:
+                if cancel is not None and cancel.is_set():
+                    error = CANCEL_MESSAGE
+                    break
+                wait = deadline - time.monotonic()
+                if wait <= 0:
+                    error = "Time limit exceeded. Is there an infinite loop?"
+                    break
+                if not worker.conn_in.poll(min(wait, CANCEL_POLL_SECONDS) if cancel is not None else wait):
+                    continue
+                try:
+                    msg = worker.conn_in.recv()
+                except (EOFError, OSError):
+                    error = "The sandbox stopped unexpectedly (CPU or memory limit)."
+                    break
+                if isinstance(msg, Progress):
+                    on_progress(msg.diff, msg.stats, msg.output)
+                    continue
+                clean = True
+                return msg
+            return WorkerResult(error=error, limited=True)
+        finally:
+            try:
+                if not clean:
+                    worker.kill()
+                    worker = _Worker(self.limits)
+            finally:
+                # If the respawn failed, the killed worker keeps its slot and
+                # the next run on it starts a new one.
+                self._idle.put(worker)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().kill()
+            except queue.Empty:
+                return
+
+
+_default_pool: Optional[SandboxPool] = None
+_default_lock = threading.Lock()
+
+def default_pool() -> Optional[SandboxPool]:
+    # Process-wide pool shared by every session; None where rlimits are unavailable.
+    global _default_pool
+    if not available():
+        return None
+    with _default_lock:
+        if _default_pool is None:
+            size = int(os.environ.get("GARDEN_SANDBOX_WORKERS", "0")) or None
+            _default_pool = SandboxPool(size, Limits(user=os.environ.get("GARDEN_SANDBOX_USER") or None,
+                                                     workdir=os.environ.get("GARDEN_SANDBOX_DIR") or None))
+        return _default_pool
+
+
+if __name__ == "__main__":
+    # Re-import by name so pickled results reference garden.workers, not __main__.
+    from multiprocessing.connection import Connection
+    from garden import workers as _w
+    # Protocol runs over the original stdout; anything else written to it goes to stderr.
+    _out = Connection(os.dup(1), readable=False)
+    os.dup2(2, 1)
+    _w._worker_main(Connection(os.dup(0), writable=False), _out, _w.Limits(**json.loads(sys.argv[1])))
@@ -0,0 +1,79 @@
+import hmac
+import os
+import time
+
+import streamlit as st
+
+from garden import metrics
+
+# ---------------------------
+# Operator page: per-stage rerun timings, engine gauges and a one-shot
+# cProfile capture. Disabled unless GARDEN_ADMIN_TOKEN is set; the token
+# is asked first.
+# ---------------------------
+
+st.set_page_config(page_title="Admin metrics", page_icon="📈", layout="wide")
+st.title("📈 Admin metrics")
+
+TOKEN = os.environ.get("GARDEN_ADMIN_TOKEN")
+if not TOKEN:
+    st.info("This page is disabled. Set GARDEN_ADMIN_TOKEN on the server to enable it.")
+    st.stop()
+if not hmac.compare_digest(st.session_state.get("admin_token", "").encode("utf-8"), TOKEN.encode("utf-8")):
+    st.text_input("Admin token", type="password", key="admin_token")
+    st.stop()
+
+# ---------- Stage timings ----------
+st.subheader("Stage timings")
+on = st.toggle("Collect timings", value=metrics.enabled(),
+               help="Process-wide. Spans are no-ops while this is off.")
+if on != metrics.enabled():
+    metrics.enable(on)
+
+rows = [{"stage": stage, **{k: round(v, 2) for k, v in h.summary().items()}}
+        for stage, h in metrics.histograms().items()]
+if rows:
+    st.table(rows)
+else:
+    st.caption("No samples yet: turn collection on and use the app.")
+if st.button("Reset timings"):
+    metrics.reset()
+    st.rerun()
+
+# ---------- Gauges ----------
+st.subheader("Engine")
+gauges = metrics.gauges()
+cols = st.columns(4)
+cols[0].metric("Draft bytes", f"{gauges['draft_bytes']:,}")
+for col, name in zip(cols[1:], ("code_cache", "html_cache", "result_cache")):
+    hits, misses = gauges[f"{name}_hits"], gauges[f"{name}_misses"]
+    rate = f"{hits / (hits + misses):.0%}" if hits + misses else "–"
+    col.metric(name.replace("_", " ").capitalize(), f"{gauges[f'{name}_size']:,} items", f"hit rate {rate}",
+               delta_color="off")
+with st.expander("All gauges"):
+    st.json(gauges)
+
+# ---------- Profiling ----------
+st.subheader("Profile one rerun")
+st.caption("The next rerun of the garden page, in any session, runs under cProfile.")
+if st.button("Profile next rerun", disabled=metrics.profile_armed()):
+    metrics.arm_profile()
+    st.rerun()
+if metrics.profile_armed():
+    st.info("Armed: waiting for the next rerun.")
+last = metrics.last_profile()
+if last is not None:
+    taken, report = last
+    st.caption(f"Captured {time.strftime('%H:%M:%S', time.localtime(taken))}")
+    st.code(report, language=None)
+    st.download_button("Download report", report, file_name="rerun_profile.txt")
+
+# ---------- Prometheus ----------
+st.subheader("Prometheus export")
+text = metrics.prometheus_text()
+port = os.environ.get("GARDEN_METRICS_PORT")
+host = os.environ.get("GARDEN_METRICS_HOST", "127.0.0.1")
+st.caption(f"Scraped at {host}:{port}/metrics." if port else "Set GARDEN_METRICS_PORT to serve this at /metrics.")
+with st.expander("Text format"):
+    st.code(text, language=None)
+st.download_button("Download metrics", text, file_name="garden_metrics.txt")
@@ -0,0 +1,48 @@
+import os
+import time
+
+import pytest
+
+pytest.importorskip("streamlit")
+from streamlit.testing.v1 import AppTest
+
+from garden import store
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Main.py")
+
+
+@pytest.fixture
+def session_store(tmp_path, monkeypatch):
+    monkeypatch.setenv("GARDEN_SESSION_STORE", f"sqlite:{tmp_path / 'sessions.db'}")
+    monkeypatch.setattr(store, "_default_store", None)
+    yield store.default_store
+    if store._default_store is not None:
+        store._default_store.close()
+
+
+def _wait_for_run(at: AppTest) -> AppTest:
+    for _ in range(50):
+        if "run_handle" not in at.session_state:
+            break
+        time.sleep(0.1)
+        at.run()
+    return at
+
+
+def test_compact_then_run_keeps_typed_code(session_store):
+    at = AppTest.from_file(MAIN, default_timeout=60).run()
+    at.text_area[0].set_value("plant_name = 5").run()
+    _wait_for_run(at.button[0].click().run())
+    assert not at.success
+
+    # Typed but not run yet when the session goes idle and is compacted.
+    at.text_area[0].set_value('plant_name = "Rosie"').run()
+    sessions = session_store()
+    sessions.flush()
+    assert sessions.evict_idle(time.time() + 10 * sessions.ttl)
+    assert at.session_state["garden"].compacted
+
+    _wait_for_run(at.button[0].click().run())
+    assert not at.exception
+    assert at.text_area[0].value == 'plant_name = "Rosie"'
+    assert at.success, [w.value for w in at.warning] + [e.value for e in at.error]
@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from garden import workers
+from garden.content import get_catalog
+from garden.grid import make_grid
+from garden.runner import run_user_code
+from garden.sandbox import exec_user_code
+from garden.workers import SandboxPool
+
+# Walks from a generator's frame to the host's globals and imports os.
+FRAME_ESCAPE = """\
+def gen(h):
+    yield h[0].gi_frame.f_back
+h = []
+g = gen(h)
+h.append(g)
+fr = next(g)
+os = fr.f_back.f_globals["__builtins__"]["__imp" + "ort__"]("os")
+print(os.getcwd(), os.getpid())
+"""
+
+# The same walk with every attribute name built at runtime.
+RUNTIME_ESCAPE = """\
+def gen(h):
+    yield getattr(getattr(h[0], "gi_" + "frame"), "f_" + "back")
+h = []
+g = gen(h)
+h.append(g)
+fr = next(g)
+print(getattr(fr, "f_" + "globals"))
+"""
+
+
+@pytest.fixture(scope="module")
+def first_step():
+    level = get_catalog().levels[0]
+    return level, level.steps[0]
+
+
+def _assert_blocked(res):
+    assert not res.ok
+    assert "disabled in this sandbox" in (res.error or res.message)
+    assert str(os.getpid()) not in res.output and os.getcwd() not in res.output
+
+
+def test_frame_escape_in_process(first_step):
+    level, step = first_step
+    res, _ = run_user_code(FRAME_ESCAPE, level, step, cache=None)
+    _assert_blocked(res)
+
+
+@pytest.mark.skipif(not workers.available(), reason="sandbox workers unavailable")
+def test_frame_escape_in_pool(first_step):
+    level, step = first_step
+    pool = SandboxPool(1)
+    try:
+        res, _ = run_user_code(FRAME_ESCAPE, level, step, pool=pool, cache=None)
+    finally:
+        pool.close()
+    _assert_blocked(res)
+
+
+def test_runtime_names_are_checked():
+    # Bypasses the AST gate to exercise the getattr check on its own.
+    with pytest.raises(AttributeError, match="disabled in this sandbox"):
+        exec_user_code(compile(RUNTIME_ESCAPE, "<user_code>", "exec"), make_grid(5))